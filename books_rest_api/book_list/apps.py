@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BookListConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'book_list'
+
+    def ready(self):
+        # connect catalog counters to model signals
+        from book_list import catalog  # noqa: F401
@@ -0,0 +1,321 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from book_list.catalog import catalog_changed, record_changes
+from book_list.forms import validate_isbn
+from book_list.importer import (
+    MAX_LENGTHS,
+    ImportResult,
+    build_book,
+    parse_volume,
+    save_books,
+)
+from book_list.models import BookChange, BookModel, IsbnModel
+
+BOOK_FIELDS = (
+    'title',
+    'author',
+    'pub_date',
+    'pub_lang',
+    'pages',
+    'cover_link',
+    'self_link',
+    'large_cover',
+)
+
+
+def iter_ndjson(lines):
+    """
+    Yield raw book records from NDJSON lines.
+
+    Every line holds a book record (BookModel fields plus 'isbn' list),
+    a Google Books volume or a whole Google Books search response.
+    Google Books volumes are turned into book records straight away.
+    :param lines: iterable of text lines
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+
+        if not isinstance(data, dict):
+            yield None
+        elif 'items' in data:
+            for volume in data['items'] or []:
+                yield _from_volume(volume)
+        elif 'volumeInfo' in data:
+            yield _from_volume(data)
+        else:
+            yield data
+
+
+def _from_volume(volume):
+    large_cover = volume.get('volumeInfo', {}).get('imageLinks', {}).get(
+        'large',
+    )
+    record = parse_volume(volume, large_cover)
+    if record is None:
+        return None
+    record['isbn'] = [
+        {'isbn_type': isbn_type, 'isbn_num': isbn_num}
+        for isbn_type, isbn_num in record['isbn']
+    ]
+    return record
+
+
+def iter_csv(lines):
+    """
+    Yield raw book records from CSV with header row.
+
+    Columns are named after BookModel fields. ISBN numbers are taken from
+    'isbn_10' and 'isbn_13' columns and from 'isbn' column holding
+    numbers separated with spaces or semicolons.
+    :param lines: iterable of text lines
+    """
+    for row in csv.DictReader(lines):
+        isbn = []
+        for column in ('isbn_10', 'isbn_13'):
+            if row.get(column):
+                isbn.append({
+                    'isbn_type': column.upper(),
+                    'isbn_num': row[column],
+                })
+        for num in (row.get('isbn') or '').replace(';', ' ').split():
+            isbn.append({'isbn_num': num})
+
+        record = {
+            field: row.get(field) or None for field in BOOK_FIELDS
+        }
+        record['isbn'] = isbn
+        yield record
+
+
+def clean_record(raw):
+    """
+    Validate raw book record and turn it into record accepted by
+    importer.save_books.
+    :param raw: dict with BookModel fields and list of ISBN numbers
+    :return: record
+    :raise: ValidationError
+    """
+    if not isinstance(raw, dict):
+        raise ValidationError('Not a book record.')
+
+    record = {}
+    for field in BOOK_FIELDS:
+        value = raw.get(field)
+        if isinstance(value, str):
+            value = value.strip() or None
+        if field == 'pages' and value is not None:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValidationError(f'Invalid number of pages: {value}')
+        elif value is not None:
+            value = str(value)
+            if len(value) > MAX_LENGTHS[field]:
+                raise ValidationError(f'{field} is too long.')
+        record[field] = value
+
+    if not record['title']:
+        raise ValidationError('Book has no title.')
+
+    isbn = []
+    for num in raw.get('isbn') or []:
+        if isinstance(num, dict):
+            isbn_type = num.get('isbn_type')
+            isbn_num = str(num.get('isbn_num') or '')
+        else:
+            isbn_type = None
+            isbn_num = str(num)
+        isbn_num = isbn_num.replace('-', '').strip()
+        if not isbn_num:
+            continue
+        validate_isbn(isbn_num)
+        isbn.append((isbn_type or f'ISBN_{len(isbn_num)}', isbn_num))
+    record['isbn'] = isbn
+    return record
+
+
+def iter_chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_value(value):
+    """
+    Format value for COPY ... FROM STDIN in text format.
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        value = 't' if value else 'f'
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _copy_rows(cursor, table, columns, rows):
+    data = io.StringIO()
+    for row in rows:
+        data.write('\t'.join(_copy_value(value) for value in row))
+        data.write('\n')
+    data.seek(0)
+    cursor.copy_expert(
+        f'COPY {table} ({", ".join(columns)}) FROM STDIN',
+        data,
+    )
+
+
+def _db_values(instance, fields):
+    return [
+        field.get_db_prep_save(field.pre_save(instance, True), connection)
+        for field in fields
+    ]
+
+
+def copy_books(records):
+    """
+    Save batch of records on PostgreSQL using COPY.
+
+    Books are copied into temporary staging table, then moved to the
+    book table with INSERT ... SELECT skipping fingerprints already
+    stored. ISBN numbers of inserted books are copied straight into
+    their table.
+    :param records: list of records returned by clean_record
+    :return: number of books added
+    """
+    book_table = BookModel._meta.db_table
+    isbn_table = IsbnModel._meta.db_table
+    fields = [
+        field for field in BookModel._meta.concrete_fields
+        if not field.primary_key
+    ]
+    columns = [connection.ops.quote_name(field.column) for field in fields]
+    column_list = ', '.join(columns)
+    books = [build_book(record) for record in records]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # ON COMMIT DROP only fires on real commit, so the table is
+        # dropped by hand below in case we run inside outer atomic block
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE book_import_staging '
+            f'(LIKE {book_table}) ON COMMIT DROP'
+        )
+        cursor.execute(
+            'ALTER TABLE book_import_staging DROP COLUMN id, '
+            'ADD COLUMN row_num integer'
+        )
+        _copy_rows(
+            cursor,
+            'book_import_staging',
+            columns + ['row_num'],
+            (
+                _db_values(book, fields) + [row_num]
+                for row_num, book in enumerate(books)
+            ),
+        )
+        cursor.execute(
+            f'INSERT INTO {book_table} ({column_list}) '
+            f'SELECT DISTINCT ON (fingerprint) {column_list} '
+            f'FROM book_import_staging '
+            f'ORDER BY fingerprint, row_num '
+            f'ON CONFLICT (fingerprint) DO NOTHING '
+            f'RETURNING id, fingerprint'
+        )
+        book_ids = {fingerprint: pk for pk, fingerprint in cursor}
+        inserted = len(book_ids)
+        if inserted:
+            catalog_changed(added=inserted)
+            record_changes(book_ids.values(), BookChange.CREATED)
+        cursor.execute('DROP TABLE book_import_staging')
+
+        isbn_fields = [
+            field for field in IsbnModel._meta.concrete_fields
+            if not field.primary_key
+        ]
+        isbn_rows = []
+        for book, record in zip(books, records):
+            # pop so books repeated within the batch get ISBNs only once
+            book_id = book_ids.pop(book.fingerprint, None)
+            if book_id is None:
+                continue
+            for isbn_type, isbn_num in record['isbn']:
+                isbn = IsbnModel(
+                    book_id=book_id,
+                    isbn_type=isbn_type,
+                    isbn_num=isbn_num,
+                )
+                isbn_rows.append(_db_values(isbn, isbn_fields))
+        _copy_rows(
+            cursor,
+            isbn_table,
+            [connection.ops.quote_name(f.column) for f in isbn_fields],
+            isbn_rows,
+        )
+    return inserted
+
+
+def import_file(lines, file_format, chunk_size=1000, use_copy=None,
+                errors=None):
+    """
+    Import books from NDJSON or CSV lines.
+
+    Records are parsed lazily and written in chunks of chunk_size, each
+    in its own transaction, so memory use doesn't depend on file size.
+    PostgreSQL uses COPY (unless use_copy is False), other databases
+    bulk inserts.
+    :param lines: iterable of text lines (e.g. open file)
+    :param file_format: 'ndjson' or 'csv'
+    :param chunk_size: number of records validated and saved at once
+    :param use_copy: force COPY on or off
+    :param errors: optional callable receiving record number and error
+    :return: ImportResult
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    parse = iter_ndjson if file_format == 'ndjson' else iter_csv
+    save = copy_books if use_copy else save_books
+
+    result = ImportResult()
+    row_num = 0
+    for chunk in iter_chunks(parse(lines), chunk_size):
+        records = []
+        for raw in chunk:
+            row_num += 1
+            try:
+                records.append(clean_record(raw))
+            except ValidationError as e:
+                result.failed += 1
+                if errors:
+                    errors(row_num, '; '.join(e.messages))
+
+        result.fetched += len(chunk)
+        if not records:
+            continue
+
+        start = time.perf_counter()
+        inserted = save(records)
+        result.insert_seconds += time.perf_counter() - start
+        result.inserted += inserted
+        result.skipped += len(records) - inserted
+
+    return result
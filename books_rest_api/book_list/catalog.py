@@ -0,0 +1,234 @@
+import hashlib
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from book_list.models import (
+    BookChange,
+    BookModel,
+    CatalogStats,
+    IsbnModel,
+    isbn_list,
+)
+
+STATS_PK = 1
+
+
+def get_stats():
+    """
+    Return catalog stats row, creating it with exact count on first use.
+    :return: CatalogStats
+    """
+    stats, created = CatalogStats.objects.get_or_create(
+        pk=STATS_PK,
+        # callable so books are counted only when row gets created
+        defaults={'book_count': BookModel.objects.count},
+    )
+    return stats
+
+
+def catalog_changed(added=0):
+    """
+    Record change of books or their ISBN numbers - bump catalog version
+    and update book counter. Model signals call it on every save and
+    delete, code writing bypassing save() (bulk inserts, COPY) has to call
+    it on its own.
+    :param added: number of books added (negative if removed)
+    """
+    CatalogStats.objects.filter(pk=STATS_PK).update(
+        book_count=F('book_count') + added,
+        version=F('version') + 1,
+        modified_at=timezone.now(),
+    )
+
+
+def record_changes(book_ids, action):
+    """
+    Log changes of books for change feed. Model signals log every save
+    and delete, code writing bypassing save() has to call it on its own.
+    :param book_ids: ids of changed books
+    :param action: BookChange.CREATED, UPDATED or DELETED
+    """
+    BookChange.objects.bulk_create(
+        [BookChange(book_id=book_id, action=action) for book_id in book_ids],
+        batch_size=1000,
+    )
+
+
+def catalog_version():
+    """
+    Return number changing on every write to books or ISBN numbers,
+    used to key caches of catalog data.
+    """
+    return get_stats().version
+
+
+def _request_stats(request):
+    # read stats once per request, both validators need them
+    if not hasattr(request, '_catalog_stats'):
+        request._catalog_stats = get_stats()
+    return request._catalog_stats
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    ETag of pages listing books, for use with django's condition decorator.
+    It changes with catalog version and with requested media type, as API
+    renders the same url as json or html.
+    :param request: HttpRequest
+    :return: ETag value
+    """
+    accept = hashlib.md5(
+        request.META.get('HTTP_ACCEPT', '').encode(),
+    ).hexdigest()[:8]
+    return f'catalog-{_request_stats(request).version}-{accept}'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """
+    Last-Modified of pages listing books, for use with django's condition
+    decorator.
+    :param request: HttpRequest
+    :return: datetime of last write to books or ISBN numbers
+    """
+    return _request_stats(request).modified_at
+
+
+def estimated_book_count():
+    """
+    Read PostgreSQL planner's estimate of number of books.
+    :return: estimate or None if not available
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [BookModel._meta.db_table],
+        )
+        row = cursor.fetchone()
+    # -1 means table was never analyzed
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def book_count():
+    """
+    Cheap number of books in catalog.
+
+    Tables larger than BOOK_COUNT_ESTIMATE_ABOVE rows are counted with
+    PostgreSQL's planner estimate, smaller ones with counter kept in
+    CatalogStats.
+    :return: number of books
+    """
+    estimate = estimated_book_count()
+    if estimate is not None and \
+            estimate >= settings.BOOK_COUNT_ESTIMATE_ABOVE:
+        return estimate
+    return get_stats().book_count
+
+
+def rebuild_isbn_lists(chunk_size=1000, progress=None):
+    """
+    Rebuild denormalized BookModel.isbn_list of all books from IsbnModel.
+    Books are processed in chunks ordered by primary key, only books whose
+    list differs are written.
+    :param chunk_size: number of books processed at once
+    :param progress: optional callable receiving number of checked books
+    :return: number of books updated
+    """
+    checked = 0
+    updated = 0
+    last_id = 0
+
+    while True:
+        books = list(
+            BookModel.objects.filter(pk__gt=last_id).order_by('pk').only(
+                'pk',
+                'isbn_list',
+                'row_version',
+            )[:chunk_size]
+        )
+        if not books:
+            break
+
+        numbers = {book.pk: [] for book in books}
+        for book_id, isbn_type, isbn_num in IsbnModel.objects.filter(
+            book_id__in=numbers,
+        ).order_by('pk').values_list('book_id', 'isbn_type', 'isbn_num'):
+            numbers[book_id].append((isbn_type, isbn_num))
+
+        changed = []
+        for book in books:
+            new_list = isbn_list(numbers[book.pk])
+            if book.isbn_list != new_list:
+                book.isbn_list = new_list
+                book.row_version += 1
+                changed.append(book)
+        with transaction.atomic():
+            BookModel.objects.bulk_update(
+                changed,
+                ['isbn_list', 'row_version'],
+            )
+            if changed:
+                catalog_changed()
+                record_changes(
+                    [book.pk for book in changed],
+                    BookChange.UPDATED,
+                )
+
+        checked += len(books)
+        updated += len(changed)
+        last_id = books[-1].pk
+        if progress:
+            progress(checked)
+
+    return updated
+
+
+@receiver(post_save, sender=BookModel)
+def _book_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        catalog_changed(added=1 if created else 0)
+        record_changes(
+            [instance.pk],
+            BookChange.CREATED if created else BookChange.UPDATED,
+        )
+
+
+@receiver(post_delete, sender=BookModel)
+def _book_deleted(sender, instance, **kwargs):
+    catalog_changed(added=-1)
+    record_changes([instance.pk], BookChange.DELETED)
+
+
+def refresh_isbn_list(book_id):
+    """
+    Copy ISBN numbers of a book to its isbn_list. Called on every save and
+    delete of IsbnModel, code writing ISBN numbers bypassing save() (bulk
+    inserts) has to fill isbn_list on its own. Book is written with
+    update(), so it isn't logged as changed second time.
+    :param book_id: id of the book
+    """
+    BookModel.objects.filter(pk=book_id).update(
+        isbn_list=isbn_list(
+            IsbnModel.objects.filter(book_id=book_id).order_by('pk')
+            .values_list('isbn_type', 'isbn_num')
+        ),
+        row_version=F('row_version') + 1,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=IsbnModel)
+@receiver(post_delete, sender=IsbnModel)
+def _isbn_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_isbn_list(instance.book_id)
+        catalog_changed()
+        record_changes([instance.book_id], BookChange.UPDATED)
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from book_list.models import BookChange, BookModel
+
+
+def read_changes(since=0, limit=None):
+    """
+    Read change feed of books after given cursor.
+
+    Changes are read in order of their ids. Changes younger than
+    BOOK_CHANGES_DELAY seconds are left for the next call, so changes of
+    transactions committed out of order are not skipped. Book changed
+    several times within the page is returned once, with its last action
+    and current data.
+    :param since: cursor returned by previous call (0 reads from the start)
+    :param limit: max number of changes read, BOOK_CHANGES_PAGE_SIZE
+        by default
+    :return: tuple (list of (book id, action, BookModel or None), next
+        cursor, True if there are more changes to read)
+    """
+    limit = limit or settings.BOOK_CHANGES_PAGE_SIZE
+    settled = timezone.now() - timedelta(seconds=settings.BOOK_CHANGES_DELAY)
+    changes = list(
+        BookChange.objects.filter(
+            id__gt=since,
+            changed_at__lte=settled,
+        ).order_by('id')[:limit + 1]
+    )
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    if not changes:
+        return [], since, False
+
+    last_actions = {}
+    for change in changes:
+        # keep the book where its last change puts it
+        last_actions.pop(change.book_id, None)
+        last_actions[change.book_id] = change.action
+
+    books = BookModel.objects.in_bulk([
+        book_id for book_id, action in last_actions.items()
+        if action != BookChange.DELETED
+    ])
+    entries = []
+    for book_id, action in last_actions.items():
+        book = books.get(book_id)
+        if book is None:
+            # deleted by a change further in the feed
+            action = BookChange.DELETED
+        entries.append((book_id, action, book))
+    return entries, changes[-1].id, has_more
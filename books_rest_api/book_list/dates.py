@@ -0,0 +1,49 @@
+import calendar
+import re
+from datetime import date
+
+YEAR = 'year'
+MONTH = 'month'
+DAY = 'day'
+
+# Google Books dates look like 2017, 2017-10 or 2017-10-19
+PARTIAL_DATE = re.compile(r'^\s*(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?')
+
+
+def parse_pub_date(value):
+    """
+    Read publication date which may be given with year or month precision.
+    :param value: date string e.g. '2017' or '2021-10-19'
+    :return: tuple (first day of the period, precision) or (None, None)
+        if date could not be read
+    """
+    match = PARTIAL_DATE.match(value or '')
+    if not match:
+        return None, None
+    year, month, day = match.groups()
+    try:
+        if day:
+            return date(int(year), int(month), int(day)), DAY
+        if month:
+            return date(int(year), int(month), 1), MONTH
+        return date(int(year), 1, 1), YEAR
+    except ValueError:
+        return None, None
+
+
+def period_end(value):
+    """
+    Last day of period given with partial date, e.g. 2017-12-31 for '2017'.
+    :param value: date string
+    :return: date or None if date could not be read
+    """
+    start, precision = parse_pub_date(value)
+    if precision == YEAR:
+        return date(start.year, 12, 31)
+    if precision == MONTH:
+        return date(
+            start.year,
+            start.month,
+            calendar.monthrange(start.year, start.month)[1],
+        )
+    return start
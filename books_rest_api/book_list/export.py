@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+
+from book_list.bulk_import import BOOK_FIELDS
+from book_list.models import BookModel
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CSV_COLUMNS = ('id',) + BOOK_FIELDS + ('isbn_10', 'isbn_13', 'isbn')
+
+
+def iter_book_rows(chunk_size=None):
+    """
+    Yield all books as dicts ordered by primary key.
+
+    Books are read with server-side cursor (on PostgreSQL) chunk_size
+    rows at a time, without creating model instances. ISBN numbers come
+    from denormalized isbn_list, so no join is needed.
+    :param chunk_size: number of rows fetched at once
+    """
+    chunk_size = chunk_size or settings.BOOK_EXPORT_CHUNK_SIZE
+    rows = BookModel.objects.order_by('pk').values(
+        'id',
+        *BOOK_FIELDS,
+        'isbn_list',
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        row['isbn'] = row.pop('isbn_list')
+        yield row
+
+
+def iter_ndjson(rows):
+    """
+    Yield NDJSON lines, one per book. Lines can be read back with
+    import_books_file command.
+    :param rows: dicts yielded by iter_book_rows
+    """
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def iter_csv(rows):
+    """
+    Yield CSV lines (header first) in format read by import_books_file.
+    ISBN-10 and ISBN-13 numbers get own columns, other ones are put in
+    'isbn' column separated with spaces.
+    :param rows: dicts yielded by iter_book_rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    yield line(CSV_COLUMNS)
+    for row in rows:
+        numbers = {'ISBN_10': '', 'ISBN_13': ''}
+        other = []
+        for isbn in row['isbn']:
+            if numbers.get(isbn['isbn_type']) == '':
+                numbers[isbn['isbn_type']] = isbn['isbn_num']
+            else:
+                other.append(isbn['isbn_num'] or '')
+        yield line(
+            [row['id']] +
+            [row[field] for field in BOOK_FIELDS] +
+            [numbers['ISBN_10'], numbers['ISBN_13'], ' '.join(other)]
+        )
+
+
+def export_books(file_format, chunk_size=None):
+    """
+    Yield whole catalog as NDJSON or CSV lines.
+    :param file_format: 'ndjson' or 'csv'
+    :param chunk_size: number of rows fetched from db at once
+    """
+    rows = iter_book_rows(chunk_size)
+    if file_format == 'csv':
+        return iter_csv(rows)
+    return iter_ndjson(rows)
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LANGUAGES = ['en', 'pl', 'de', 'fr', 'es']
+
+
+def isbn_13(num):
+    """
+    Create valid ISBN 13 for given number.
+    """
+    digits = f'978{num:09d}'
+    control = sum(
+        int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(digits)
+    )
+    return digits + str((10 - control % 10) % 10)
+
+
+def isbn_10(num):
+    """
+    Create valid ISBN 10 for given number.
+    """
+    digits = f'{num:09d}'
+    control = sum(int(digit) * (i + 1) for i, digit in enumerate(digits))
+    control = control % 11
+    return digits + ('X' if control == 10 else str(control))
+
+
+class FakeGoogleBooks:
+    """
+    Local stand-in for Google Books API serving synthetic volumes.
+
+    Every search returns the same `total` volumes, paged the way Google
+    does it (startIndex / maxResults). Volume details (selfLink) contain
+    large cover link. Responses carry ETag and are answered with 304 if it
+    matches If-None-Match. Each request can be delayed by `latency` seconds,
+    fail with 503 with `error_rate` probability and get throttled (429
+    with Retry-After: 1) with `throttle_rate` probability.
+    """
+
+    def __init__(self, total=40, latency=0.0, error_rate=0.0,
+                 throttle_rate=0.0, host='127.0.0.1', port=0):
+        self.total = total
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        Base url to use as GOOGLE_BOOKS_API_URL.
+        """
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/books/v1'
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def volume(self, num, details=False):
+        """
+        Create synthetic volume.
+        :param num: volume number
+        :param details: add fields present only in volume details
+        """
+        volume_id = f'fake{num:07d}'
+        image_links = {
+            'thumbnail': f'http://books.example/{volume_id}/thumbnail.jpg',
+        }
+        if details:
+            image_links['large'] = f'http://books.example/{volume_id}/' \
+                                   f'large.jpg'
+
+        return {
+            'kind': 'books#volume',
+            'id': volume_id,
+            'selfLink': f'{self.url}/volumes/{volume_id}',
+            'volumeInfo': {
+                'title': f'Synthetic Book {num}',
+                'authors': [f'Author {num % 97}', f'Author {num % 89}'],
+                'publishedDate': f'{1950 + num % 70}-{num % 12 + 1:02d}-'
+                                 f'{num % 28 + 1:02d}',
+                'language': LANGUAGES[num % len(LANGUAGES)],
+                'pageCount': 100 + num % 900,
+                'industryIdentifiers': [
+                    {'type': 'ISBN_13', 'identifier': isbn_13(num)},
+                    {'type': 'ISBN_10', 'identifier': isbn_10(num)},
+                ],
+                'imageLinks': image_links,
+            },
+        }
+
+    def search(self, start_index, max_results):
+        return {
+            'kind': 'books#volumes',
+            'totalItems': self.total,
+            'items': [
+                self.volume(num) for num in range(
+                    start_index,
+                    min(start_index + max_results, self.total),
+                )
+            ],
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep connections open like Google does
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if random.random() < fake.error_rate:
+                    return self.send_json(503, {'error': 'backend error'})
+                if random.random() < fake.throttle_rate:
+                    return self.send_json(
+                        429,
+                        {'error': 'rate limit exceeded'},
+                        {'Retry-After': '1'},
+                    )
+
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                path = url.path.rstrip('/')
+
+                if path == '/books/v1/volumes':
+                    try:
+                        start_index = int(params.get('startIndex', [0])[0])
+                        max_results = int(params.get('maxResults', [10])[0])
+                    except ValueError:
+                        return self.send_json(400, {'error': 'bad request'})
+                    return self.send_json(
+                        200,
+                        fake.search(start_index, min(max_results, 40)),
+                    )
+
+                if path.startswith('/books/v1/volumes/fake'):
+                    num = path.rsplit('fake', 1)[1]
+                    if num.isdigit() and int(num) < fake.total:
+                        return self.send_json(
+                            200,
+                            fake.volume(int(num), details=True),
+                        )
+
+                return self.send_json(404, {'error': 'not found'})
+
+            def send_json(self, status, data, headers=None):
+                body = json.dumps(data).encode()
+                if status == 200:
+                    etag = f'"{hashlib.md5(body).hexdigest()}"'
+                    headers = {**(headers or {}), 'ETag': etag}
+                    if self.headers.get('If-None-Match') == etag:
+                        status, body = 304, b''
+                self.send_response(status)
+                if status != 304:
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
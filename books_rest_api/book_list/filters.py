@@ -0,0 +1,46 @@
+import django_filters
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+from book_list.models import BookModel
+from book_list.search import filter_pub_date, search_books
+
+
+class BookFilter(django_filters.FilterSet):
+    """
+    Books API filters. Publication date range takes the same partial dates
+    as book list search (2017, 2017-10 or 2017-10-19) and uses indexed
+    normalized publication date.
+    """
+    date_from = django_filters.CharFilter(
+        method='filter_date_from',
+        label='Published since',
+    )
+    date_to = django_filters.CharFilter(
+        method='filter_date_to',
+        label='Published until',
+    )
+
+    class Meta:
+        model = BookModel
+        fields = []
+
+    def filter_date_from(self, queryset, name, value):
+        return filter_pub_date(queryset, date_from=value)
+
+    def filter_date_to(self, queryset, name, value):
+        return filter_pub_date(queryset, date_to=value)
+
+
+class BookSearchFilter(SearchFilter):
+    """
+    Search filter using the same search engine as the book list page.
+    Results are ordered by relevance unless ordering was requested.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        q = ' '.join(self.get_search_terms(request))
+        if not q:
+            return queryset
+        ranked = not request.query_params.get(api_settings.ORDERING_PARAM)
+        return search_books(queryset, q, ranked=ranked)
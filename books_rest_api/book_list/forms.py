@@ -1,6 +1,6 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from book_list.models import BookModel
+from book_list.models import BookModel, book_fingerprint
 
 
 def validate_isbn(isbn):
@@ -21,10 +21,15 @@ def validate_isbn(isbn):
         if not digit.isdigit():
             raise ValidationError('ISBN must consist of numbers.')
 
+    if not isbn:
+        raise ValidationError('ISBN is empty.')
+
     if isbn[-1] == 'X':
         check_sum = 10
-    else:
+    elif isbn[-1].isdigit():
         check_sum = int(isbn[-1])
+    else:
+        raise ValidationError(f'{isbn} is not a valid isbn')
 
     if len(isbn) == 10:
         for num in isbn[:-1]:
@@ -126,6 +131,21 @@ class AddBookForm(forms.ModelForm):
         self.fields['large_cover'].required = False
         self.fields['self_link'].required = False
 
+    def clean(self):
+        cleaned_data = super().clean()
+        fingerprint = book_fingerprint(
+            cleaned_data.get('title'),
+            cleaned_data.get('author'),
+            cleaned_data.get('pub_lang'),
+            cleaned_data.get('pub_date'),
+        )
+        duplicates = BookModel.objects.filter(fingerprint=fingerprint)
+        if self.instance.pk:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise ValidationError('This book is already on the list.')
+        return cleaned_data
+
 
 class ImportBooksForm(forms.Form):
     """
@@ -157,6 +177,11 @@ class ImportBooksForm(forms.Form):
         required=False,
     )
 
+    all_pages = forms.BooleanField(
+        label='Import all results (not only first 40)',
+        required=False,
+    )
+
     search_title.widget.attrs.update({
         'placeholder': 'title',
         'aria-label': 'search by title',
@@ -0,0 +1,291 @@
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+import hashlib
+import time
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from book_list.throttling import RequestScheduler
+
+
+def _build_session():
+    """
+    Create a requests session shared by all Google Books calls.
+    Connection pool is sized to match the number of worker threads
+    (volume details and result pages are fetched at the same time).
+    :return: requests.Session
+    """
+    pool_size = settings.GOOGLE_BOOKS_MAX_WORKERS + \
+        settings.GOOGLE_BOOKS_MAX_PAGE_WORKERS
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+session = _build_session()
+
+_scheduler = None
+
+
+def get_scheduler():
+    """
+    Return scheduler all Google Books requests have to go through,
+    so rate limit and circuit breaker are shared by all threads.
+    :return: RequestScheduler
+    """
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler(
+            session,
+            rate=settings.GOOGLE_BOOKS_RATE,
+            burst=settings.GOOGLE_BOOKS_BURST,
+            max_retries=settings.GOOGLE_BOOKS_MAX_RETRIES,
+            backoff_base=settings.GOOGLE_BOOKS_BACKOFF_BASE,
+            backoff_max=settings.GOOGLE_BOOKS_BACKOFF_MAX,
+            breaker_threshold=settings.GOOGLE_BOOKS_BREAKER_THRESHOLD,
+            breaker_reset=settings.GOOGLE_BOOKS_BREAKER_RESET,
+        )
+    return _scheduler
+
+
+@receiver(setting_changed)
+def _reset_scheduler(setting, **kwargs):
+    global _scheduler
+    if setting.startswith('GOOGLE_BOOKS_'):
+        _scheduler = None
+
+
+# max number of results Google Books API returns per page
+MAX_RESULTS = 40
+
+
+def _cache_key(url):
+    return 'google_books:' + hashlib.sha256(url.encode()).hexdigest()
+
+
+def get_json(url):
+    """
+    Fetch url from Google Books API and decode json response.
+
+    Responses are kept in 'google_books' cache keyed by url. Entries
+    younger than GOOGLE_BOOKS_CACHE_TTL seconds are served without asking
+    Google, older ones are revalidated with If-None-Match and served from
+    cache if Google answers 304 Not Modified. Cache backend takes care of
+    size limit and of dropping entries nobody asked for in a long time.
+    :param url: url to fetch
+    :return: decoded json or None if request failed
+    """
+    cache = caches['google_books']
+    key = _cache_key(url)
+    entry = cache.get(key)
+
+    if entry and time.time() - entry['fetched_at'] < \
+            settings.GOOGLE_BOOKS_CACHE_TTL:
+        return entry['data']
+
+    headers = {}
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+
+    try:
+        resp = get_scheduler().get(
+            url,
+            headers=headers,
+            timeout=settings.GOOGLE_BOOKS_TIMEOUT,
+        )
+    except requests.RequestException as e:
+        print(e)
+        return None
+
+    if resp.status_code == 304 and entry:
+        entry['fetched_at'] = time.time()
+        cache.set(key, entry)
+        return entry['data']
+
+    if resp.status_code != 200:
+        return None
+
+    try:
+        data = resp.json()
+    except ValueError as e:
+        print(e)
+        return None
+
+    cache.set(key, {
+        'data': data,
+        'etag': resp.headers.get('ETag'),
+        'fetched_at': time.time(),
+    })
+    return data
+
+
+def get_volume(self_link, etag=None):
+    """
+    Fetch volume details bypassing response cache.
+    :param self_link: volume details url
+    :param etag: ETag of previously fetched version
+    :return: tuple (data, etag) - data is None if volume is not modified
+    :raise: requests.RequestException if volume could not be fetched
+    """
+    headers = {'If-None-Match': etag} if etag else {}
+    resp = get_scheduler().get(
+        self_link,
+        headers=headers,
+        timeout=settings.GOOGLE_BOOKS_TIMEOUT,
+    )
+    if resp.status_code == 304:
+        return None, etag
+    resp.raise_for_status()
+    return resp.json(), resp.headers.get('ETag')
+
+
+def get_large_cover(self_link):
+    """
+    Look up volume details and return link to large cover image.
+    :param self_link: volume details url
+    :return: large cover url or None
+    """
+    self_info = get_json(self_link)
+    try:
+        return self_info['volumeInfo']['imageLinks']['large']
+    except (KeyError, TypeError):
+        return None
+
+
+def fetch_large_covers(volumes):
+    """
+    Fetch volume details for all volumes concurrently.
+
+    Number of parallel lookups is limited by GOOGLE_BOOKS_MAX_WORKERS,
+    each lookup is limited by GOOGLE_BOOKS_TIMEOUT. Failed or timed out
+    lookups give no cover and don't hold up the other ones.
+    :param volumes: list of volumes returned by Google Books search
+    :return: dict mapping selfLink to large cover url (or None)
+    """
+    links = {v['selfLink'] for v in volumes if v.get('selfLink')}
+    covers = {}
+    if not links:
+        return covers
+
+    workers = min(settings.GOOGLE_BOOKS_MAX_WORKERS, len(links))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(get_large_cover, link): link for link in links
+        }
+        for future in as_completed(futures):
+            try:
+                covers[futures[future]] = future.result()
+            except Exception as e:
+                print(e)
+                covers[futures[future]] = None
+    return covers
+
+
+def build_query(title=None, author=None, isbn=None, publisher=None,
+                subject=None):
+    """
+    Build Google Books search query out of import criteria.
+    :return: query string for q parameter
+    """
+    terms = []
+    if title:
+        terms.append(f'intitle:"{title}"')
+    if author:
+        terms.append(f'inauthor:"{author}"')
+    if isbn:
+        terms.append(f'isbn:{isbn}')
+    if publisher:
+        terms.append(f'inpublisher:"{publisher}"')
+    if subject:
+        terms.append(f'subject:"{subject}"')
+    return ' '.join(terms)
+
+
+def search_volumes(query, start_index=0):
+    """
+    Get single page of search results from Google Books API.
+    :param query: query built with build_query
+    :param start_index: index of first result on the page
+    :return: decoded json or None
+    """
+    params = urlencode({
+        'q': query,
+        'maxResults': MAX_RESULTS,
+        'startIndex': start_index,
+    })
+    return get_json(f'{settings.GOOGLE_BOOKS_API_URL}/volumes?{params}')
+
+
+def iter_volume_pages(query, all_pages=False):
+    """
+    Yield pages (lists of volumes) of search results.
+
+    First page is always fetched on its own as it tells total number of
+    results. If all_pages is set remaining pages are requested in parallel,
+    at most GOOGLE_BOOKS_MAX_PAGE_WORKERS at a time, and yielded in order
+    they arrive so caller can store each one straight away. Pages that
+    could not be fetched are yielded as None.
+    :param query: query built with build_query
+    :param all_pages: fetch all pages instead of just the first one
+    """
+    first_page = search_volumes(query)
+    if not first_page or not first_page.get('totalItems'):
+        return
+
+    yield first_page.get('items', [])
+
+    total = int(first_page['totalItems'])
+    if not all_pages or total <= MAX_RESULTS:
+        return
+
+    start_indexes = iter(range(MAX_RESULTS, total, MAX_RESULTS))
+    workers = settings.GOOGLE_BOOKS_MAX_PAGE_WORKERS
+    exhausted = False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            # keep no more than `workers` pages in flight
+            while not exhausted and len(pending) < workers:
+                start_index = next(start_indexes, None)
+                if start_index is None:
+                    break
+                pending.add(
+                    executor.submit(search_volumes, query, start_index)
+                )
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    page = future.result()
+                except Exception as e:
+                    print(e)
+                    page = None
+                if page is None:
+                    # let caller know the page got lost
+                    yield None
+                    continue
+                items = page.get('items')
+                if not items:
+                    # totalItems is only an estimate - stop asking for
+                    # further pages once Google runs out of results.
+                    exhausted = True
+                    continue
+                yield items
@@ -0,0 +1,375 @@
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from book_list.catalog import catalog_changed, record_changes
+from book_list.google_books import (
+    fetch_large_covers,
+    iter_volume_pages,
+)
+from book_list.models import (
+    BookChange,
+    BookModel,
+    ImportJob,
+    IsbnModel,
+    isbn_list,
+)
+
+
+@dataclass
+class ImportResult:
+    """
+    Counters describing outcome of an import.
+    """
+    fetched: int = 0
+    inserted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    failed_pages: int = 0
+    insert_seconds: float = 0
+
+    @property
+    def insert_rate(self):
+        """
+        Number of books inserted per second spent writing to db.
+        """
+        if not self.insert_seconds:
+            return None
+        return round(self.inserted / self.insert_seconds, 1)
+
+
+# max lengths of text fields of BookModel
+MAX_LENGTHS = {
+    field.name: field.max_length
+    for field in BookModel._meta.concrete_fields
+    if getattr(field, 'max_length', None)
+}
+
+LINK_FIELDS = ('cover_link', 'self_link', 'large_cover')
+
+
+def fit_record(record):
+    """
+    Make record values fit their db columns, so one oversized volume
+    doesn't fail the whole batch. Text is truncated, links that are too
+    long (and would be broken by truncating) are dropped.
+    :param record: dict returned by parse_volume
+    :return: the same record
+    """
+    for field, max_length in MAX_LENGTHS.items():
+        value = record.get(field)
+        if value is None or len(value) <= max_length:
+            continue
+        if field in LINK_FIELDS:
+            record[field] = None
+        else:
+            record[field] = value[:max_length]
+    return record
+
+
+def parse_volume(volume, large_cover=None):
+    """
+    Turn Google Books volume into dict of BookModel fields.
+    ISBN numbers are stored under 'isbn' key as list of
+    (isbn_type, isbn_num) tuples.
+    :param volume: volume from Google Books search results
+    :param large_cover: large cover link looked up in volume details
+    :return: dict or None if volume has no title
+    """
+    info = volume.get('volumeInfo', {})
+    title = info.get('title')
+    if not title:
+        return None
+
+    try:
+        page_count = int(info['pageCount'])
+    except (KeyError, TypeError, ValueError):
+        page_count = None
+
+    authors = info.get('authors')
+
+    return fit_record({
+        'title': title,
+        'author': ', '.join(authors) if authors else None,
+        'pub_date': info.get('publishedDate'),
+        'pub_lang': info.get('language'),
+        'pages': page_count,
+        'cover_link': info.get('imageLinks', {}).get('thumbnail'),
+        'self_link': volume.get('selfLink'),
+        'large_cover': large_cover,
+        'isbn': [
+            (num['type'], num['identifier'])
+            for num in info.get('industryIdentifiers', [])
+            if 'isbn' in num.get('type', '').lower() and
+            len(num.get('identifier', '')) <= 255
+        ],
+    })
+
+
+# attempts at writing a batch that collided with a parallel import
+SAVE_ATTEMPTS = 3
+
+
+def build_book(record):
+    """
+    Create unsaved BookModel (with fingerprint, normalized date and ISBN
+    list) out of parsed record.
+    :param record: dict returned by parse_volume
+    :return: BookModel
+    """
+    book = BookModel(**{
+        field: value for field, value in record.items() if field != 'isbn'
+    })
+    book.isbn_list = isbn_list(record['isbn'])
+    book.set_fingerprint()
+    book.set_pub_date_value()
+    return book
+
+
+def save_book(record):
+    """
+    Save single parsed volume unless the same book is already in db.
+    :param record: dict returned by parse_volume
+    :return: True if book was added
+    """
+    book = build_book(record)
+
+    if BookModel.objects.filter(fingerprint=book.fingerprint).exists():
+        return False
+
+    try:
+        with transaction.atomic():
+            book.save()
+            for isbn_type, isbn_num in record['isbn']:
+                IsbnModel.objects.create(
+                    book_id=book.pk,
+                    isbn_num=isbn_num,
+                    isbn_type=isbn_type,
+                )
+    except IntegrityError:
+        # added by parallel import in the meantime
+        return False
+    return True
+
+
+def save_books(records):
+    """
+    Save batch of parsed volumes in a single transaction.
+
+    Fingerprints of all books are looked up with one query and books
+    already in db (or repeated within the batch) are left out. The rest is
+    written with one bulk insert and returned primary keys are used to
+    write all ISBN numbers with another one. Unique fingerprint makes
+    the insert fail if parallel import added the same book in the
+    meantime - the batch is then checked and written again.
+    :param records: list of dicts returned by parse_volume
+    :return: number of books added
+    """
+    books = [(build_book(record), record) for record in records]
+
+    for attempt in range(SAVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _save_new_books(books)
+        except IntegrityError:
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
+            for book, record in books:
+                book.pk = None
+
+
+def _save_new_books(books):
+    """
+    Insert books not present in db yet along with their ISBN numbers.
+    :param books: list of (BookModel, record) pairs
+    :return: number of books added
+    """
+    existing = set(BookModel.objects.filter(
+        fingerprint__in={book.fingerprint for book, record in books},
+    ).values_list('fingerprint', flat=True))
+
+    new_books = []
+    for book, record in books:
+        if book.fingerprint not in existing:
+            existing.add(book.fingerprint)
+            new_books.append((book, record))
+
+    BookModel.objects.bulk_create([book for book, record in new_books])
+    if new_books:
+        catalog_changed(added=len(new_books))
+        record_changes(
+            [book.pk for book, record in new_books],
+            BookChange.CREATED,
+        )
+    IsbnModel.objects.bulk_create([
+        IsbnModel(
+            book_id=book.pk,
+            isbn_num=isbn_num,
+            isbn_type=isbn_type,
+        )
+        for book, record in new_books
+        for isbn_type, isbn_num in record['isbn']
+    ])
+    return len(new_books)
+
+
+def import_page(volumes, result, bulk=None):
+    """
+    Store one page of Google Books search results.
+    :param volumes: list of volumes
+    :param result: ImportResult updated in place
+    :param bulk: write whole page at once (save_books) instead of book by
+        book (save_book), defaults to BOOK_IMPORT_BULK setting
+    """
+    if bulk is None:
+        bulk = settings.BOOK_IMPORT_BULK
+
+    covers = fetch_large_covers(volumes)
+    result.fetched += len(volumes)
+
+    records = []
+    for volume in volumes:
+        try:
+            record = parse_volume(volume, covers.get(volume.get('selfLink')))
+        except Exception as e:
+            print(e)
+            record = None
+
+        if record is None:
+            result.failed += 1
+        else:
+            records.append(record)
+
+    start = time.perf_counter()
+    if bulk:
+        inserted = save_books(records)
+    else:
+        inserted = sum(save_book(record) for record in records)
+    result.insert_seconds += time.perf_counter() - start
+
+    result.inserted += inserted
+    result.skipped += len(records) - inserted
+
+
+def import_books(query, all_pages=False, progress=None, bulk=None):
+    """
+    Import books matching query from Google Books API.
+    Every page is stored as soon as it's downloaded.
+    :param query: query built with google_books.build_query
+    :param all_pages: import all pages of results, not only first 40
+    :param progress: optional callable receiving ImportResult after
+        every page
+    :param bulk: see import_page
+    :return: ImportResult
+    """
+    result = ImportResult()
+    for volumes in iter_volume_pages(query, all_pages=all_pages):
+        if volumes is None:
+            result.failed_pages += 1
+        else:
+            import_page(volumes, result, bulk=bulk)
+        if progress:
+            progress(result)
+    return result
+
+
+def claim_next_job():
+    """
+    Take oldest queued import job and mark it as running.
+    Locked rows are skipped so several workers can share the queue.
+    :return: ImportJob or None if queue is empty
+    """
+    with transaction.atomic():
+        job = ImportJob.objects.select_for_update(skip_locked=True).filter(
+            status=ImportJob.QUEUED,
+        ).order_by('created_at').first()
+
+        if job is None:
+            return None
+
+        job.status = ImportJob.RUNNING
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=[
+            'status',
+            'started_at',
+            'attempts',
+            'updated_at',
+        ])
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Put back in the queue running jobs which made no progress for
+    IMPORT_JOBS_STALE_AFTER seconds (their worker most likely died).
+    Jobs which already used up IMPORT_JOBS_MAX_ATTEMPTS are failed.
+    Books imported by the dead worker are skipped as duplicates.
+    :return: number of jobs requeued or failed
+    """
+    stale = ImportJob.objects.filter(
+        status=ImportJob.RUNNING,
+        updated_at__lt=timezone.now() - timedelta(
+            seconds=settings.IMPORT_JOBS_STALE_AFTER,
+        ),
+    )
+    now = timezone.now()
+    failed = stale.filter(
+        attempts__gte=settings.IMPORT_JOBS_MAX_ATTEMPTS,
+    ).update(
+        status=ImportJob.FAILED,
+        error='Import worker stopped responding',
+        finished_at=now,
+        updated_at=now,
+    )
+    requeued = stale.update(
+        status=ImportJob.QUEUED,
+        started_at=None,
+        updated_at=now,
+    )
+    return failed + requeued
+
+
+def run_import_job(job):
+    """
+    Run import job storing its progress in db after every page.
+    :param job: ImportJob
+    """
+    def progress(result):
+        job.fetched = result.fetched
+        job.inserted = result.inserted
+        job.skipped = result.skipped
+        job.failed = result.failed
+        job.insert_rate = result.insert_rate
+        job.save(update_fields=[
+            'fetched',
+            'inserted',
+            'skipped',
+            'failed',
+            'insert_rate',
+            'updated_at',
+        ])
+
+    try:
+        result = import_books(
+            job.query,
+            all_pages=job.all_pages,
+            progress=progress,
+        )
+    except Exception as e:
+        job.status = ImportJob.FAILED
+        job.error = str(e)
+    else:
+        progress(result)
+        job.status = ImportJob.DONE
+        if result.failed_pages:
+            job.error = f'{result.failed_pages} result pages could not be ' \
+                        f'fetched'
+
+    job.finished_at = timezone.now()
+    job.save()
+    return job
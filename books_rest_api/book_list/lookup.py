@@ -0,0 +1,79 @@
+from django.core.exceptions import ValidationError
+
+from book_list.forms import validate_isbn
+from book_list.models import BookModel, IsbnModel
+from book_list.serializers import BookRowSerializer
+
+
+def normalize_isbn(value):
+    """
+    Strip hyphens and spaces from ISBN number and check it.
+    :param value: ISBN-10 or ISBN-13 as given by client
+    :return: ISBN number as stored in db
+    :raise: ValidationError
+    """
+    isbn = str(value).replace('-', '').replace(' ', '').upper()
+    if not isbn:
+        raise ValidationError('ISBN is empty.')
+    validate_isbn(isbn)
+    return isbn
+
+
+def lookup_books(ids=(), isbn=(), fields=None):
+    """
+    Find books by primary keys and ISBN numbers.
+
+    ISBN numbers are resolved to book ids with one query on indexed
+    IsbnModel.isbn_num, then all books are read with one pk IN query and
+    returned as BookRowSerializer output. ISBN found on several books
+    resolves to the oldest one.
+    :param ids: book ids (ints or numeric strings)
+    :param isbn: ISBN-10 / ISBN-13 numbers, hyphens are allowed
+    :param fields: field names to output, see BookRowSerializer
+    :return: dict with 'ids' and 'isbn' dicts mapping every given value to
+        a book or None, and 'errors' dict of values which are not valid
+        ids or ISBN numbers
+    """
+    errors = {}
+    book_ids = {}
+    for value in ids:
+        try:
+            book_ids[str(value)] = int(value)
+        except (TypeError, ValueError):
+            errors[str(value)] = 'Invalid book id.'
+
+    numbers = {}
+    for value in isbn:
+        try:
+            numbers[str(value)] = normalize_isbn(value)
+        except ValidationError as e:
+            errors[str(value)] = '; '.join(e.messages)
+
+    # oldest book wins when ISBN is found on several books
+    isbn_owners = dict(IsbnModel.objects.filter(
+        isbn_num__in=set(numbers.values()),
+    ).order_by('-book_id').values_list('isbn_num', 'book_id'))
+
+    serializer = BookRowSerializer(fields)
+    book_ids_found = set(book_ids.values()) | set(isbn_owners.values())
+    by_id = {}
+    if book_ids_found:
+        rows = list(BookModel.objects.filter(pk__in=book_ids_found).values(
+            'id',
+            *serializer.columns,
+        ))
+        by_id = {
+            row['id']: book
+            for row, book in zip(rows, serializer.to_representation(rows))
+        }
+
+    return {
+        'ids': {
+            value: by_id.get(book_id) for value, book_id in book_ids.items()
+        },
+        'isbn': {
+            value: by_id.get(isbn_owners.get(number))
+            for value, number in numbers.items()
+        },
+        'errors': errors,
+    }
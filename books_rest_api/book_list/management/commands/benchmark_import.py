@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from book_list.fake_google_books import FakeGoogleBooks
+from book_list.importer import import_books
+
+
+class Command(BaseCommand):
+    """
+    Measure Google Books import speed against local stand-in server.
+    Every run is rolled back, so the database is left untouched.
+    """
+    help = 'Benchmark importing books from fake Google Books API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[40, 400, 4000],
+            help='numbers of volumes to import',
+        )
+        parser.add_argument('--latency', type=float, default=0)
+        parser.add_argument('--error-rate', type=float, default=0)
+        parser.add_argument('--throttle-rate', type=float, default=0)
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=1000,
+            help='requests per second allowed by rate limiter',
+        )
+        parser.add_argument(
+            '--per-row',
+            action='store_true',
+            help='save books one by one instead of in batches',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            'volumes  inserted  seconds  volumes/s  queries  '
+            'queries/volume  inserts/s'
+        )
+        for size in options['sizes']:
+            self.run(size, options)
+
+    def run(self, size, options):
+        server = FakeGoogleBooks(
+            total=size,
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            throttle_rate=options['throttle_rate'],
+        )
+        # responses must not come from cache
+        caches = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'google_books': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            },
+        }
+
+        with server, override_settings(
+                GOOGLE_BOOKS_API_URL=server.url,
+                GOOGLE_BOOKS_RATE=options['rate'],
+                GOOGLE_BOOKS_BURST=int(options['rate']),
+                CACHES=caches,
+        ), transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            result = import_books(
+                'intitle:"benchmark"',
+                all_pages=True,
+                bulk=not options['per_row'],
+            )
+            seconds = time.perf_counter() - start
+            transaction.set_rollback(True)
+
+        queries = len(ctx.captured_queries)
+        self.stdout.write(
+            f'{result.fetched:7d}  {result.inserted:8d}  {seconds:7.2f}  '
+            f'{result.fetched / seconds:9.1f}  {queries:7d}  '
+            f'{queries / max(result.fetched, 1):14.2f}  '
+            f'{result.insert_rate or 0:9.1f}'
+        )
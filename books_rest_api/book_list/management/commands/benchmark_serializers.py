@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from book_list.fake_google_books import LANGUAGES, isbn_10, isbn_13
+from book_list.importer import build_book
+from book_list.models import BookModel
+from book_list.serializers import BookRowSerializer, BookSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compare speed of BookSerializer (model instances) and
+    BookRowSerializer (values() rows) on synthetic books, including
+    reading them from db and rendering JSON. Books are inserted in
+    a transaction which is rolled back, so the database is left untouched.
+    """
+    help = 'Benchmark books API serializers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[100, 1000, 10000],
+            help='numbers of books to serialize',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='best of this many runs is reported',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            '  books  serializer rows/s  row serializer rows/s  speedup  '
+            'same output'
+        )
+        for size in options['sizes']:
+            with transaction.atomic():
+                self.run(size, options['repeat'])
+                transaction.set_rollback(True)
+
+    def run(self, size, repeat):
+        BookModel.objects.bulk_create([
+            build_book({
+                'title': f'Benchmark Book {num}',
+                'author': f'Author {num % 97}',
+                'pub_date': f'{1950 + num % 70}',
+                'pub_lang': LANGUAGES[num % len(LANGUAGES)],
+                'pages': 100 + num % 900,
+                'cover_link': f'http://books.example/{num}/thumbnail.jpg',
+                'self_link': f'http://books.example/{num}',
+                'large_cover': None,
+                'isbn': [('ISBN_13', isbn_13(num)), ('ISBN_10', isbn_10(num))],
+            })
+            for num in range(size)
+        ], batch_size=1000)
+        queryset = BookModel.objects.order_by('title', 'author', 'pub_date')
+        renderer = JSONRenderer()
+        row_serializer = BookRowSerializer()
+
+        def serialize():
+            return renderer.render(
+                BookSerializer(queryset.all()[:size], many=True).data,
+            )
+
+        def serialize_rows():
+            rows = queryset.values(*row_serializer.columns)[:size]
+            return renderer.render(row_serializer.to_representation(rows))
+
+        seconds, output = self.measure(serialize, repeat)
+        row_seconds, row_output = self.measure(serialize_rows, repeat)
+        self.stdout.write(
+            f'{size:7d}  {size / seconds:17.1f}  '
+            f'{size / row_seconds:21.1f}  {seconds / row_seconds:7.2f}  '
+            f'{"yes" if output == row_output else "NO"}'
+        )
+
+    @staticmethod
+    def measure(func, repeat):
+        """
+        :return: best time of `repeat` calls in seconds and last result
+        """
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        return best, result
@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from book_list.export import export_books
+
+
+class Command(BaseCommand):
+    """
+    Write whole catalog to NDJSON or CSV file, which can be imported with
+    import_books_file command. Books are streamed, so memory use doesn't
+    depend on catalog size.
+    """
+    help = 'Export all books (with ISBNs) to NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='file to write, "-" writes standard output',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            default='ndjson',
+            help='file format',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='number of books read from db at once',
+        )
+
+    def handle(self, *args, **options):
+        lines = export_books(options['format'], options['chunk_size'])
+        path = options['path']
+        if path == '-':
+            sys.stdout.writelines(lines)
+            return
+
+        try:
+            output = open(path, 'w', newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(e)
+        with output:
+            output.writelines(lines)
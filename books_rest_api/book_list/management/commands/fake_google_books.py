@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from book_list.fake_google_books import FakeGoogleBooks
+
+
+class Command(BaseCommand):
+    """
+    Run local stand-in for Google Books API.
+    Point GOOGLE_BOOKS_API_URL at printed url to import from it.
+    """
+    help = 'Serve synthetic Google Books volumes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--total',
+            type=int,
+            default=400,
+            help='number of volumes returned by every search',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0,
+            help='seconds each response is delayed by',
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0,
+            help='share of requests answered with 503 (0 - 1)',
+        )
+        parser.add_argument(
+            '--throttle-rate',
+            type=float,
+            default=0,
+            help='share of requests answered with 429 (0 - 1)',
+        )
+
+    def handle(self, *args, **options):
+        server = FakeGoogleBooks(
+            total=options['total'],
+            latency=options['latency'],
+            error_rate=options['error_rate'],
+            throttle_rate=options['throttle_rate'],
+            port=options['port'],
+        )
+        self.stdout.write(f'Serving fake Google Books API at {server.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
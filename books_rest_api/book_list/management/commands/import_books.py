@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from book_list.google_books import build_query
+from book_list.importer import import_books
+
+
+class Command(BaseCommand):
+    """
+    Import books from Google Books API outside of web request.
+    Imports all pages of results unless --first-page is given.
+    """
+    help = 'Import books matching given criteria from Google Books API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--title')
+        parser.add_argument('--author')
+        parser.add_argument('--isbn')
+        parser.add_argument('--publisher')
+        parser.add_argument('--subject')
+        parser.add_argument(
+            '--first-page',
+            action='store_true',
+            help='import only first 40 results',
+        )
+        parser.add_argument(
+            '--per-row',
+            action='store_true',
+            help='save books one by one instead of in batches',
+        )
+
+    def handle(self, *args, **options):
+        query = build_query(
+            title=options['title'],
+            author=options['author'],
+            isbn=options['isbn'],
+            publisher=options['publisher'],
+            subject=options['subject'],
+        )
+        if not query:
+            self.stderr.write('Give at least one import criterion.')
+            return
+
+        result = import_books(
+            query,
+            all_pages=not options['first_page'],
+            bulk=not options['per_row'],
+        )
+        self.stdout.write(
+            f'fetched: {result.fetched}, inserted: {result.inserted}, '
+            f'skipped: {result.skipped}, failed: {result.failed}, '
+            f'failed pages: {result.failed_pages}'
+        )
+        self.stdout.write(
+            f'insert time: {result.insert_seconds:.3f}s, '
+            f'books per second: {result.insert_rate}'
+        )
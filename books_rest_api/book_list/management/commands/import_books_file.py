@@ -0,0 +1,75 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from book_list.bulk_import import import_file
+
+
+class Command(BaseCommand):
+    """
+    Stream books from NDJSON or CSV file into db.
+    File is read lazily, so it can be of any size.
+    """
+    help = 'Import books (with ISBNs) from NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='file to import, "-" reads standard input',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['ndjson', 'csv'],
+            help='file format, guessed from extension if not given',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='number of records validated and saved at once',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help="don't use COPY on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            if path.endswith('.csv'):
+                file_format = 'csv'
+            elif path.endswith(('.ndjson', '.jsonl', '.json')):
+                file_format = 'ndjson'
+            else:
+                raise CommandError('Give file format with --format.')
+
+        def errors(row_num, message):
+            self.stderr.write(f'record {row_num}: {message}')
+
+        if path == '-':
+            # stdin is not ours to close
+            self.import_lines(sys.stdin, file_format, errors, options)
+            return
+
+        try:
+            lines = open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(e)
+        with lines:
+            self.import_lines(lines, file_format, errors, options)
+
+    def import_lines(self, lines, file_format, errors, options):
+        result = import_file(
+            lines,
+            file_format,
+            chunk_size=options['chunk_size'],
+            use_copy=False if options['no_copy'] else None,
+            errors=errors,
+        )
+        self.stdout.write(
+            f'records: {result.fetched}, inserted: {result.inserted}, '
+            f'skipped: {result.skipped}, failed: {result.failed}, '
+            f'books per second: {result.insert_rate}'
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from book_list.catalog import rebuild_isbn_lists
+
+
+class Command(BaseCommand):
+    """
+    Rebuild ISBN numbers stored on books (BookModel.isbn_list) from
+    IsbnModel, e.g. after ISBN numbers were changed in db by hand.
+    """
+    help = 'Rebuild denormalized ISBN lists of all books'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='number of books processed at once',
+        )
+
+    def handle(self, *args, **options):
+        def progress(checked):
+            self.stdout.write(f'checked: {checked}')
+
+        updated = rebuild_isbn_lists(
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        self.stdout.write(f'books updated: {updated}')
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from book_list.importer import (
+    claim_next_job,
+    requeue_stale_jobs,
+    run_import_job,
+)
+
+
+class Command(BaseCommand):
+    """
+    Worker process running queued Google Books import jobs.
+    """
+    help = 'Process queued Google Books import jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='exit as soon as the queue is empty',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2,
+            help='seconds to wait before checking empty queue again',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # don't keep using connection db server may have dropped
+            close_old_connections()
+            requeue_stale_jobs()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f'Running import job {job.pk}: {job.query}')
+            job = run_import_job(job)
+            self.stdout.write(
+                f'Import job {job.pk} {job.status} - '
+                f'fetched: {job.fetched}, inserted: {job.inserted}, '
+                f'skipped: {job.skipped}, failed: {job.failed}, '
+                f'books per second: {job.insert_rate}'
+            )
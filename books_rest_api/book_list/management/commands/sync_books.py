@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from book_list.sync import sync_books
+
+
+class Command(BaseCommand):
+    """
+    Re-sync stored books with Google Books through their self links.
+    Meant to be run periodically (e.g. by a scheduler).
+    """
+    help = 'Refresh metadata of imported books from Google Books API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='number of books fetched and compared at once',
+        )
+        parser.add_argument(
+            '--start-id',
+            type=int,
+            default=0,
+            help='resume after book with this id',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='max number of books to check',
+        )
+
+    def handle(self, *args, **options):
+        def progress(result, last_id):
+            self.stdout.write(
+                f'checked: {result.checked} (up to id {last_id}), '
+                f'updated: {result.updated}'
+            )
+
+        result = sync_books(
+            chunk_size=options['chunk_size'],
+            start_id=options['start_id'],
+            limit=options['limit'],
+            progress=progress,
+        )
+        self.stdout.write(
+            f'checked: {result.checked}, not modified: {result.not_modified}, '
+            f'unchanged: {result.unchanged}, updated: {result.updated}, '
+            f'failed: {result.failed}'
+        )
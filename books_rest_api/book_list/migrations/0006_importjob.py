@@ -0,0 +1,34 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0005_alter_bookmodel_cover_link_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=1500, verbose_name='Google Books query')),
+                ('all_pages', models.BooleanField(default=False, verbose_name='Import all pages')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10, verbose_name='Status')),
+                ('fetched', models.IntegerField(default=0, verbose_name='Volumes fetched')),
+                ('inserted', models.IntegerField(default=0, verbose_name='Books inserted')),
+                ('skipped', models.IntegerField(default=0, verbose_name='Duplicates skipped')),
+                ('failed', models.IntegerField(default=0, verbose_name='Volumes failed')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('started_at', models.DateTimeField(null=True, verbose_name='Started at')),
+                ('finished_at', models.DateTimeField(null=True, verbose_name='Finished at')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='importjob',
+            index=models.Index(fields=['status', 'created_at'], name='book_list_i_status_aef9b3_idx'),
+        ),
+    ]
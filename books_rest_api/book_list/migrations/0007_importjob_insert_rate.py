@@ -0,0 +1,18 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0006_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='insert_rate',
+            field=models.FloatField(null=True, verbose_name='Books inserted per second'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:58
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_fingerprints(apps, schema_editor):
+    """
+    Compute fingerprints of existing books. Books duplicating one already
+    fingerprinted are left without one so unique constraint can be added.
+    """
+    BookModel = apps.get_model('book_list', 'BookModel')
+    seen = set()
+    books = []
+
+    for book in BookModel.objects.order_by('pk').iterator():
+        key = '\x1f'.join(value or '' for value in (
+            book.title,
+            book.author,
+            book.pub_lang,
+            book.pub_date,
+        ))
+        fingerprint = hashlib.sha256(key.encode()).hexdigest()
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        book.fingerprint = fingerprint
+        books.append(book)
+
+    BookModel.objects.bulk_update(books, ['fingerprint'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0007_importjob_insert_rate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmodel',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, null=True, verbose_name='fingerprint'),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bookmodel',
+            name='fingerprint',
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True, verbose_name='fingerprint'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0008_bookmodel_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmodel',
+            name='source_etag',
+            field=models.CharField(editable=False, max_length=255, null=True, verbose_name='Google Books ETag'),
+        ),
+        migrations.AddField(
+            model_name='bookmodel',
+            name='source_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, verbose_name='Google Books content hash'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+import hashlib
+
+from django.db import migrations
+
+# fields copied from a duplicate if the kept book has no value
+FILL_FIELDS = (
+    'pages',
+    'cover_link',
+    'self_link',
+    'large_cover',
+)
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Merge books left without fingerprint by 0008 into the book they
+    duplicate. Kept book gets ISBN numbers it doesn't have yet and values
+    it is missing, then the duplicate is deleted. Without this saving
+    a duplicate would fail on the unique fingerprint.
+    """
+    BookModel = apps.get_model('book_list', 'BookModel')
+    IsbnModel = apps.get_model('book_list', 'IsbnModel')
+
+    for book in BookModel.objects.filter(
+        fingerprint__isnull=True,
+    ).order_by('pk').iterator():
+        key = '\x1f'.join(value or '' for value in (
+            book.title,
+            book.author,
+            book.pub_lang,
+            book.pub_date,
+        ))
+        fingerprint = hashlib.sha256(key.encode()).hexdigest()
+        kept = BookModel.objects.filter(fingerprint=fingerprint).first()
+        if kept is None:
+            book.fingerprint = fingerprint
+            book.save(update_fields=['fingerprint'])
+            continue
+
+        update_fields = []
+        for field in FILL_FIELDS:
+            if getattr(kept, field) in (None, '') and getattr(book, field):
+                setattr(kept, field, getattr(book, field))
+                update_fields.append(field)
+        if update_fields:
+            kept.save(update_fields=update_fields)
+
+        kept_isbn = set(
+            IsbnModel.objects.filter(book=kept).values_list(
+                'isbn_type',
+                'isbn_num',
+            )
+        )
+        for isbn in IsbnModel.objects.filter(book=book):
+            if (isbn.isbn_type, isbn.isbn_num) not in kept_isbn:
+                kept_isbn.add((isbn.isbn_type, isbn.isbn_num))
+                isbn.book = kept
+                isbn.save(update_fields=['book'])
+        book.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0010_importjob_updated_at_attempts'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
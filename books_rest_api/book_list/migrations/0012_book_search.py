@@ -0,0 +1,54 @@
+from django.db import migrations
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(pub_lang, '')), 'C')"
+)
+
+
+def add_search_indexes(apps, schema_editor):
+    """
+    Add search_vector column kept up to date by PostgreSQL and indexes
+    used by book_list.search. Other databases search without indexes.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'ALTER TABLE book_list_bookmodel ADD COLUMN search_vector tsvector '
+        f'GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED'
+    )
+    schema_editor.execute(
+        'CREATE INDEX book_list_book_search_idx ON book_list_bookmodel '
+        'USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX book_list_book_title_trgm_idx ON book_list_bookmodel '
+        'USING gin (title gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX book_list_book_author_trgm_idx ON book_list_bookmodel '
+        'USING gin (author gin_trgm_ops)'
+    )
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS book_list_book_title_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS book_list_book_author_trgm_idx')
+    schema_editor.execute(
+        'ALTER TABLE book_list_bookmodel DROP COLUMN IF EXISTS search_vector'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0011_merge_duplicate_books'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:14
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0012_book_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookmodel',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('author', django.db.models.expressions.Value('')), django.db.models.expressions.F('title'), django.db.models.functions.comparison.Coalesce('pub_date', django.db.models.expressions.Value('')), django.db.models.expressions.F('id'), name='book_list_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookmodel',
+            index=models.Index(django.db.models.expressions.F('title'), django.db.models.functions.comparison.Coalesce('author', django.db.models.expressions.Value('')), django.db.models.functions.comparison.Coalesce('pub_date', django.db.models.expressions.Value('')), django.db.models.expressions.F('id'), name='book_api_order_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0013_book_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book_count', models.BigIntegerField(default=0, verbose_name='Number of books')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0014_catalogstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogstats',
+            name='version',
+            field=models.BigIntegerField(default=0, verbose_name='Catalog version'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+from book_list.dates import parse_pub_date
+
+
+def fill_pub_date_values(apps, schema_editor):
+    """
+    Normalize publication dates of existing books.
+    """
+    BookModel = apps.get_model('book_list', 'BookModel')
+    books = []
+
+    for book in BookModel.objects.filter(
+        pub_date__isnull=False,
+    ).only('pk', 'pub_date').iterator():
+        book.pub_date_value, book.pub_date_precision = parse_pub_date(
+            book.pub_date,
+        )
+        if book.pub_date_value:
+            books.append(book)
+        if len(books) == 1000:
+            BookModel.objects.bulk_update(
+                books,
+                ['pub_date_value', 'pub_date_precision'],
+            )
+            books = []
+
+    BookModel.objects.bulk_update(
+        books,
+        ['pub_date_value', 'pub_date_precision'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0015_catalogstats_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmodel',
+            name='pub_date_precision',
+            field=models.CharField(choices=[('year', 'Year'), ('month', 'Month'), ('day', 'Day')], editable=False, max_length=5, null=True, verbose_name='Publication date precision'),
+        ),
+        migrations.AddField(
+            model_name='bookmodel',
+            name='pub_date_value',
+            field=models.DateField(db_index=True, editable=False, null=True, verbose_name='Publication date (first day)'),
+        ),
+        migrations.RunPython(fill_pub_date_values, migrations.RunPython.noop),
+    ]
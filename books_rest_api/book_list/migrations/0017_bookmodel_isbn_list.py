@@ -0,0 +1,43 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:20
+
+from django.db import migrations, models
+
+
+def fill_isbn_lists(apps, schema_editor):
+    """
+    Copy ISBN numbers of existing books to isbn_list.
+    """
+    BookModel = apps.get_model('book_list', 'BookModel')
+    IsbnModel = apps.get_model('book_list', 'IsbnModel')
+    numbers = {}
+
+    for book_id, isbn_type, isbn_num in IsbnModel.objects.order_by(
+        'pk',
+    ).values_list('book_id', 'isbn_type', 'isbn_num').iterator():
+        numbers.setdefault(book_id, []).append({
+            'isbn_type': isbn_type,
+            'isbn_num': isbn_num,
+        })
+
+    books = []
+    for book in BookModel.objects.only('pk').iterator():
+        if book.pk in numbers:
+            book.isbn_list = numbers[book.pk]
+            books.append(book)
+    BookModel.objects.bulk_update(books, ['isbn_list'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0016_bookmodel_pub_date_value'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmodel',
+            name='isbn_list',
+            field=models.JSONField(default=list, editable=False, verbose_name='ISBN numbers'),
+        ),
+        migrations.RunPython(fill_isbn_lists, migrations.RunPython.noop),
+    ]
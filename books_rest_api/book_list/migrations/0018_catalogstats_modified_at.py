@@ -0,0 +1,19 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:21
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0017_bookmodel_isbn_list'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogstats',
+            name='modified_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Catalog modified at'),
+        ),
+    ]
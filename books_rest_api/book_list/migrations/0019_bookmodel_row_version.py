@@ -0,0 +1,18 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0018_catalogstats_modified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookmodel',
+            name='row_version',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Row version'),
+        ),
+    ]
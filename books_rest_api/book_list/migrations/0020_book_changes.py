@@ -0,0 +1,55 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:23
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def log_existing_books(apps, schema_editor):
+    """
+    Log existing books as created, so change feed read from the start
+    covers the whole catalog.
+    """
+    BookModel = apps.get_model('book_list', 'BookModel')
+    BookChange = apps.get_model('book_list', 'BookChange')
+    changes = []
+
+    for book_id in BookModel.objects.order_by('pk').values_list(
+        'pk',
+        flat=True,
+    ).iterator():
+        changes.append(BookChange(book_id=book_id, action='created'))
+        if len(changes) == 1000:
+            BookChange.objects.bulk_create(changes)
+            changes = []
+    BookChange.objects.bulk_create(changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0019_bookmodel_row_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('book_id', models.BigIntegerField(verbose_name='Book id')),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=7, verbose_name='Action')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Changed at')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bookmodel',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Created at'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='bookmodel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+        migrations.RunPython(log_existing_books, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.1 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book_list', '0020_book_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='isbnmodel',
+            name='isbn_num',
+            field=models.CharField(db_index=True, max_length=255, null=True, verbose_name='isbn'),
+        ),
+    ]
@@ -1,4 +1,38 @@
+import hashlib
+
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from book_list.dates import DAY, MONTH, YEAR, parse_pub_date
+
+
+def book_fingerprint(title, author, pub_lang, pub_date):
+    """
+    Create fingerprint identifying the same book when importing.
+    Empty values are treated same as missing ones.
+    :return: sha256 hex digest of title, author, language and date
+    """
+    key = '\x1f'.join(value or '' for value in (
+        title,
+        author,
+        pub_lang,
+        pub_date,
+    ))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def isbn_list(numbers):
+    """
+    Create denormalized list of ISBN numbers stored on BookModel.
+    :param numbers: iterable of (isbn_type, isbn_num) pairs
+    :return: list of dicts shaped like IsbnSerializer output
+    """
+    return [
+        {'isbn_type': isbn_type, 'isbn_num': isbn_num}
+        for isbn_type, isbn_num in numbers
+    ]
 
 
 class BookModel(models.Model):
@@ -21,6 +55,23 @@ class BookModel(models.Model):
         verbose_name='Publication date',
         null=True,
     )
+    pub_date_value = models.DateField(
+        verbose_name='Publication date (first day)',
+        null=True,
+        editable=False,
+        db_index=True,
+    )
+    pub_date_precision = models.CharField(
+        max_length=5,
+        choices=[
+            (YEAR, 'Year'),
+            (MONTH, 'Month'),
+            (DAY, 'Day'),
+        ],
+        verbose_name='Publication date precision',
+        null=True,
+        editable=False,
+    )
     pub_lang = models.CharField(
         max_length=255,
         verbose_name='Publication language',
@@ -45,6 +96,103 @@ class BookModel(models.Model):
         verbose_name='Large cover link',
         null=True,
     )
+    fingerprint = models.CharField(
+        max_length=64,
+        verbose_name='fingerprint',
+        unique=True,
+        null=True,
+        editable=False,
+    )
+    isbn_list = models.JSONField(
+        default=list,
+        verbose_name='ISBN numbers',
+        editable=False,
+    )
+    row_version = models.IntegerField(
+        default=0,
+        verbose_name='Row version',
+        editable=False,
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created at',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Updated at',
+    )
+    source_etag = models.CharField(
+        max_length=255,
+        verbose_name='Google Books ETag',
+        null=True,
+        editable=False,
+    )
+    source_hash = models.CharField(
+        max_length=64,
+        verbose_name='Google Books content hash',
+        null=True,
+        editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            # sort keys of book list and books API (see pagination.Keyset)
+            models.Index(
+                Coalesce('author', Value('')),
+                'title',
+                Coalesce('pub_date', Value('')),
+                'id',
+                name='book_list_order_idx',
+            ),
+            models.Index(
+                'title',
+                Coalesce('author', Value('')),
+                Coalesce('pub_date', Value('')),
+                'id',
+                name='book_api_order_idx',
+            ),
+        ]
+
+    def set_fingerprint(self):
+        """
+        Update fingerprint after title, author, language or date change.
+        """
+        self.fingerprint = book_fingerprint(
+            self.title,
+            self.author,
+            self.pub_lang,
+            self.pub_date,
+        )
+
+    def set_pub_date_value(self):
+        """
+        Update normalized publication date after pub_date change.
+        """
+        self.pub_date_value, self.pub_date_precision = parse_pub_date(
+            self.pub_date,
+        )
+
+    def save(self, *args, **kwargs):
+        self.set_fingerprint()
+        self.set_pub_date_value()
+        # cached renders of the book are keyed with row version - it's
+        # incremented in db, so concurrent saves never write the same one
+        if self._state.adding:
+            self.row_version += 1
+        else:
+            self.row_version = F('row_version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                'fingerprint',
+                'pub_date_value',
+                'pub_date_precision',
+                'row_version',
+                'updated_at',
+            }
+        super().save(*args, **kwargs)
+        if not isinstance(self.row_version, int):
+            self.refresh_from_db(fields=['row_version'])
 
 
 class IsbnModel(models.Model):
@@ -60,9 +208,157 @@ class IsbnModel(models.Model):
         max_length=255,
         verbose_name='isbn',
         null=True,
+        db_index=True,
     )
     book = models.ForeignKey(
         to=BookModel,
         related_name='book_isbn',
         on_delete=models.CASCADE,
     )
+
+
+class ImportJob(models.Model):
+    """
+    Database model storing Google Books import jobs processed by
+    run_import_worker command.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    query = models.CharField(
+        max_length=1500,
+        verbose_name='Google Books query',
+    )
+    all_pages = models.BooleanField(
+        default=False,
+        verbose_name='Import all pages',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name='Status',
+    )
+    fetched = models.IntegerField(
+        default=0,
+        verbose_name='Volumes fetched',
+    )
+    inserted = models.IntegerField(
+        default=0,
+        verbose_name='Books inserted',
+    )
+    skipped = models.IntegerField(
+        default=0,
+        verbose_name='Duplicates skipped',
+    )
+    failed = models.IntegerField(
+        default=0,
+        verbose_name='Volumes failed',
+    )
+    insert_rate = models.FloatField(
+        null=True,
+        verbose_name='Books inserted per second',
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Error',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created at',
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        verbose_name='Started at',
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        verbose_name='Finished at',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Last progress at',
+    )
+    attempts = models.IntegerField(
+        default=0,
+        verbose_name='Attempts',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def as_dict(self):
+        """
+        Return job status as dict ready to be sent as json.
+        """
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'fetched': self.fetched,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'insert_rate': self.insert_rate,
+            'error': self.error,
+            'finished': self.status in (self.DONE, self.FAILED),
+        }
+
+
+class CatalogStats(models.Model):
+    """
+    Single row model keeping catalog wide numbers up to date on writes
+    so list pages don't have to count books on every request.
+    See book_list.catalog.
+    """
+    book_count = models.BigIntegerField(
+        default=0,
+        verbose_name='Number of books',
+    )
+    version = models.BigIntegerField(
+        default=0,
+        verbose_name='Catalog version',
+    )
+    modified_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Catalog modified at',
+    )
+
+
+class BookChange(models.Model):
+    """
+    Database model logging every change of a book, read by change feed
+    (books/api/changes/). Id of the change is the feed cursor. Book is
+    referenced by id only so changes of deleted books are kept.
+    """
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    book_id = models.BigIntegerField(
+        verbose_name='Book id',
+    )
+    action = models.CharField(
+        max_length=7,
+        choices=ACTION_CHOICES,
+        verbose_name='Action',
+    )
+    changed_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Changed at',
+    )
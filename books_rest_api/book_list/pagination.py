@@ -0,0 +1,270 @@
+import base64
+import json
+from collections import OrderedDict
+from functools import cached_property
+
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import BooleanField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from book_list.catalog import book_count
+from book_list.models import BookModel
+
+
+def encode_cursor(position):
+    """
+    Turn sort key values of a row into url safe cursor.
+    :param position: list of sort key values
+    :return: cursor string
+    """
+    data = json.dumps(position, separators=(',', ':'), ensure_ascii=False)
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor, size):
+    """
+    Read sort key values from cursor.
+    :param cursor: cursor created by encode_cursor
+    :param size: expected number of sort keys
+    :return: list of sort key values or None if cursor is invalid
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(position, list) or len(position) != size:
+        return None
+    *values, pk = position
+    if not all(isinstance(value, str) for value in values) or \
+            not isinstance(pk, int):
+        return None
+    return position
+
+
+class CatalogPaginator(Paginator):
+    """
+    Paginator taking number of all books from catalog counter (see
+    book_list.catalog.book_count) instead of running COUNT(*). Filtered
+    querysets are still counted. Large catalogs may be counted only
+    approximately - pages past the estimate are then shown as last page.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and query.model is BookModel and \
+                not query.where:
+            return book_count()
+        return super().count
+
+    def page_window(self, number):
+        """
+        Page numbers to link to around current page, with ELLIPSIS in
+        place of skipped ones.
+        :param number: current page number
+        """
+        return list(self.get_elided_page_range(
+            number,
+            on_each_side=2,
+            on_ends=1,
+        ))
+
+
+class KeysetPage:
+    """
+    Single page of books paginated with Keyset.
+    """
+
+    def __init__(self, object_list, keyset, has_next, has_previous):
+        self.object_list = object_list
+        self.keyset = keyset
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.object_list:
+            return None
+        return encode_cursor(self.keyset.position(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous or not self.object_list:
+            return None
+        return encode_cursor(self.keyset.position(self.object_list[0]))
+
+
+class Keyset:
+    """
+    Seek (keyset) pagination of books ordered by given fields.
+
+    Instead of OFFSET every page continues after sort key values of the
+    last row of previous page, so page 10 000 costs the same as page 1.
+    Nullable fields are sorted as empty strings and primary key is the
+    last sort key, so every row has unique position. Matching composite
+    indexes are declared in BookModel.Meta.
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+
+    def _keys(self):
+        """
+        :return: list of (order by name, sql, alias expression or None)
+        """
+        quote_name = connection.ops.quote_name
+        table = quote_name(BookModel._meta.db_table)
+        keys = []
+        for name in self.fields + ('id',):
+            field = BookModel._meta.get_field(name)
+            column = f'{table}.{quote_name(field.column)}'
+            if field.null:
+                keys.append((
+                    f'{name}_key',
+                    f"COALESCE({column}, '')",
+                    Coalesce(name, Value('')),
+                ))
+            else:
+                keys.append((name, column, None))
+        return keys
+
+    def order(self, queryset):
+        """
+        Order queryset by sort keys.
+        """
+        keys = self._keys()
+        return queryset.alias(**{
+            name: expression for name, sql, expression in keys if expression
+        }).order_by(*[name for name, sql, expression in keys])
+
+    def position(self, book):
+        """
+        :param book: BookModel or values() row (with id)
+        :return: sort key values of given book
+        """
+        if isinstance(book, dict):
+            return [book[name] or '' for name in self.fields] + [book['id']]
+        return [getattr(book, name) or '' for name in self.fields] + [book.pk]
+
+    def page(self, queryset, per_page, after=None, before=None):
+        """
+        Get page of books following `after` or preceding `before` cursor.
+        Invalid cursors give the first page.
+        :param queryset: BookModel queryset
+        :param per_page: number of books on page
+        :param after: cursor of last book on previous page
+        :param before: cursor of first book on next page
+        :return: KeysetPage
+        """
+        keys = self._keys()
+        queryset = self.order(queryset)
+        backwards = False
+        position = None
+        if before:
+            position = decode_cursor(before, len(keys))
+            backwards = position is not None
+        if position is None and after:
+            position = decode_cursor(after, len(keys))
+
+        if position is not None:
+            columns = ', '.join(sql for name, sql, expression in keys)
+            placeholders = ', '.join(['%s'] * len(keys))
+            queryset = queryset.filter(RawSQL(
+                f'({columns}) {"<" if backwards else ">"} ({placeholders})',
+                position,
+                output_field=BooleanField(),
+            ))
+        if backwards:
+            queryset = queryset.reverse()
+
+        books = list(queryset[:per_page + 1])
+        has_more = len(books) > per_page
+        books = books[:per_page]
+        if backwards:
+            books.reverse()
+            return KeysetPage(books, self, True, has_more)
+        return KeysetPage(books, self, has_more, position is not None)
+
+
+class BookPagination(PageNumberPagination):
+    """
+    Books API pagination.
+
+    Books in default order are paginated with keyset cursors (?after= and
+    ?before=), total count is only computed when ?count=1 is given. Page
+    number pagination is used when ?page= is given or books are ordered
+    otherwise (search ranking or ?ordering=).
+    """
+    django_paginator_class = CatalogPaginator
+    keyset = Keyset('title', 'author', 'pub_date')
+    after_query_param = 'after'
+    before_query_param = 'before'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_page = None
+        if self.page_query_param in request.query_params or \
+                tuple(queryset.query.order_by) != self.keyset.fields:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.request = request
+        self.display_page_controls = False
+        self.count = None
+        if request.query_params.get('count'):
+            self.count = queryset.count()
+        self.keyset_page = self.keyset.page(
+            queryset,
+            page_size,
+            after=request.query_params.get(self.after_query_param),
+            before=request.query_params.get(self.before_query_param),
+        )
+        return list(self.keyset_page)
+
+    def get_paginated_response(self, data):
+        if self.keyset_page is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def _cursor_link(self, param, cursor):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.after_query_param)
+        url = remove_query_param(url, self.before_query_param)
+        return replace_query_param(url, param, cursor)
+
+    def get_next_link(self):
+        if self.keyset_page is None:
+            return super().get_next_link()
+        cursor = self.keyset_page.next_cursor
+        if cursor is None:
+            return None
+        return self._cursor_link(self.after_query_param, cursor)
+
+    def get_previous_link(self):
+        if self.keyset_page is None:
+            return super().get_previous_link()
+        cursor = self.keyset_page.previous_cursor
+        if cursor is None:
+            return None
+        return self._cursor_link(self.before_query_param, cursor)
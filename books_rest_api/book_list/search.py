@@ -0,0 +1,160 @@
+import re
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramSimilarity,
+)
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+from book_list.caching import LRUCache
+from book_list.catalog import catalog_version
+from book_list.dates import parse_pub_date, period_end
+from book_list.models import BookModel
+
+# text search configuration of search_vector column - titles come in many
+# languages so words are not stemmed
+SEARCH_CONFIG = 'simple'
+
+# ordered ids of books matching recent searches
+result_cache = LRUCache(
+    settings.BOOK_SEARCH_CACHE_SIZE,
+    settings.BOOK_SEARCH_CACHE_TTL,
+)
+
+
+def normalize_query(q):
+    """
+    Collapse whitespace in search query.
+    :param q: query typed by user
+    :return: normalized query
+    """
+    return ' '.join((q or '').split())
+
+
+def prefix_terms(q):
+    """
+    Turn search query into raw tsquery matching words starting with every
+    typed word, so partial words ('Fellow') find whole ones ('Fellowship').
+    :param q: normalized query
+    :return: tsquery string e.g. 'warriors:* & go:*' or '' if query has no
+        words
+    """
+    words = re.findall(r'\w+', q.lower())
+    return ' & '.join(f'{word}:*' for word in words)
+
+
+def search_books(queryset, q, ranked=True):
+    """
+    Filter books matching search query.
+
+    On PostgreSQL books are matched against search_vector column (title,
+    author and language, GIN indexed) - whole words or words starting with
+    typed ones - and by trigram similarity of title or author so typos
+    still find the book. Results are ordered by
+    relevance, ties keep queryset ordering. Other databases fall back to
+    case insensitive substring match.
+    :param queryset: BookModel queryset
+    :param q: query typed by user
+    :param ranked: order results by relevance
+    :return: filtered queryset
+    """
+    q = normalize_query(q)
+    if not q:
+        return queryset
+
+    if connection.vendor != 'postgresql':
+        return queryset.filter(
+            Q(title__icontains=q) |
+            Q(author__icontains=q) |
+            Q(pub_lang__icontains=q)
+        )
+
+    query = SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+    prefix = prefix_terms(q)
+    if prefix:
+        query = query | SearchQuery(
+            prefix,
+            config=SEARCH_CONFIG,
+            search_type='raw',
+        )
+    vector = RawSQL(
+        f'{connection.ops.quote_name(BookModel._meta.db_table)}.'
+        f'{connection.ops.quote_name("search_vector")}',
+        [],
+        output_field=SearchVectorField(),
+    )
+    queryset = queryset.alias(search=vector).filter(
+        Q(search=query) |
+        Q(title__trigram_similar=q) |
+        Q(author__trigram_similar=q)
+    )
+    if not ranked:
+        return queryset
+
+    return queryset.annotate(
+        rank=SearchRank(vector, query) + Greatest(
+            TrigramSimilarity('title', q),
+            TrigramSimilarity('author', q),
+        ),
+    ).order_by('-rank', *queryset.query.order_by)
+
+
+def filter_pub_date(queryset, date_from=None, date_to=None):
+    """
+    Filter books published within date range, using indexed normalized
+    publication date. Bounds may be partial dates - '2017' as date_from
+    means since 2017-01-01, as date_to until 2017-12-31. Bounds which
+    can't be read are ignored.
+    :param queryset: BookModel queryset
+    :param date_from: lower bound e.g. '2017' or '2017-10-19'
+    :param date_to: upper bound
+    :return: filtered queryset
+    """
+    start, precision = parse_pub_date(date_from)
+    if start:
+        queryset = queryset.filter(pub_date_value__gte=start)
+    end = period_end(date_to)
+    if end:
+        queryset = queryset.filter(pub_date_value__lte=end)
+    return queryset
+
+
+def search_book_ids(search='', date_from=None, date_to=None):
+    """
+    Return ids of books matching book list search, in display order.
+
+    Ids are cached per normalized query and catalog version, so paging
+    through popular search doesn't repeat it and any write to books makes
+    cached results stale. At most BOOK_SEARCH_MAX_RESULTS ids are kept.
+    :param search: keywords
+    :param date_from: publication date lower bound
+    :param date_to: publication date upper bound
+    :return: list of book primary keys
+    """
+    search = normalize_query(search)
+    key = (search, date_from or '', date_to or '', catalog_version())
+    ids = result_cache.get(key)
+    if ids is not None:
+        return ids
+
+    books = filter_pub_date(
+        search_books(
+            BookModel.objects.order_by('author', 'title', 'pub_date_value'),
+            search,
+        ),
+        date_from,
+        date_to,
+    )
+
+    ids = list(books.values_list(
+        'pk',
+        flat=True,
+    )[:settings.BOOK_SEARCH_MAX_RESULTS])
+    result_cache.set(key, ids)
+    return ids
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from book_list.models import BookModel, IsbnModel
 
 
@@ -14,15 +15,29 @@ class IsbnSerializer(serializers.ModelSerializer):
         ]
 
 
-class BookSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
     """
-    Create BookModel serializer with nested ISBN serializer.
-    Uses nested ISBN serializer.
+    Let serializer output only some of its fields.
+    Takes `fields` argument - list of field names to keep (in any order,
+    output keeps order of Meta.fields).
     """
-    isbn = IsbnSerializer(
-        many=True,
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class BookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """
+    Create BookModel serializer.
+    ISBN numbers are read from denormalized isbn_list, which has the same
+    shape as IsbnSerializer output, so no join is needed.
+    """
+    isbn = serializers.JSONField(
         read_only=True,
-        source='book_isbn',
+        source='isbn_list',
     )
 
     class Meta:
@@ -38,3 +53,65 @@ class BookSerializer(serializers.ModelSerializer):
             'self_link',
             'large_cover',
         ]
+
+
+class BookRowSerializer:
+    """
+    Read-only, fast version of BookSerializer for lists of books.
+
+    Works on values() rows instead of model instances and copies column
+    values straight into output dicts, skipping serializer field objects.
+    Output is identical to BookSerializer's, as all its fields return
+    db values unchanged.
+    :param fields: field names to output, as in DynamicFieldsMixin
+    """
+
+    def __init__(self, fields=None):
+        self.fields = [
+            (name, field.source)
+            for name, field in BookSerializer(fields=fields).fields.items()
+        ]
+
+    @property
+    def columns(self):
+        """
+        Names of columns to pass to values().
+        """
+        return [source for name, source in self.fields]
+
+    def to_representation(self, rows):
+        """
+        :param rows: iterable of values() rows
+        :return: list of dicts
+        """
+        fields = self.fields
+        return [{name: row[source] for name, source in fields} for row in rows]
+
+
+def requested_fields(query_params):
+    """
+    Read BookSerializer fields requested with ?fields= and ?exclude=
+    (comma separated field names).
+    :param query_params: request query params
+    :return: list of field names or None if all fields are requested
+    :raise: ValidationError if unknown field is requested
+    """
+    names = BookSerializer.Meta.fields
+    selected = None
+    for param in ('fields', 'exclude'):
+        value = query_params.get(param)
+        if not value:
+            continue
+        requested = {name.strip() for name in value.split(',')} - {''}
+        unknown = requested - set(names)
+        if unknown:
+            raise ValidationError({
+                param: f'Unknown fields: {", ".join(sorted(unknown))}',
+            })
+        if param == 'fields':
+            selected = [name for name in names if name in requested]
+        else:
+            selected = [
+                name for name in selected or names if name not in requested
+            ]
+    return selected
@@ -0,0 +1,179 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from book_list.google_books import get_volume
+from book_list.importer import parse_volume
+from book_list.models import BookModel, IsbnModel, isbn_list
+
+# book fields refreshed from Google Books
+SYNC_FIELDS = (
+    'title',
+    'author',
+    'pub_date',
+    'pub_lang',
+    'pages',
+    'cover_link',
+    'large_cover',
+)
+
+
+@dataclass
+class SyncResult:
+    """
+    Counters describing outcome of catalog re-sync.
+    """
+    checked: int = 0
+    not_modified: int = 0
+    unchanged: int = 0
+    updated: int = 0
+    failed: int = 0
+
+
+def content_hash(volume):
+    """
+    Hash of volume details, ignoring fields we don't store.
+    :param volume: volume details from Google Books
+    :return: sha256 hex digest
+    """
+    info = volume.get('volumeInfo', {})
+    content = json.dumps(
+        [info, volume.get('selfLink')],
+        sort_keys=True,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def _fetch(book):
+    try:
+        return get_volume(book.self_link, book.source_etag)
+    except Exception as e:
+        print(e)
+        return None
+
+
+def sync_book(book, volume, etag, result):
+    """
+    Store changes of a single book.
+    Only fields which changed are written.
+    :param book: BookModel
+    :param volume: volume details from Google Books
+    :param etag: ETag of volume details
+    :param result: SyncResult updated in place
+    """
+    new_hash = content_hash(volume)
+    if new_hash == book.source_hash:
+        result.unchanged += 1
+        if etag != book.source_etag:
+            book.source_etag = etag
+            book.save(update_fields=['source_etag'])
+        return
+
+    info = volume.get('volumeInfo', {})
+    record = parse_volume(
+        volume,
+        info.get('imageLinks', {}).get('large'),
+    )
+    if record is None:
+        result.failed += 1
+        return
+
+    update_fields = ['source_hash', 'source_etag']
+    for field in SYNC_FIELDS:
+        if getattr(book, field) != record[field]:
+            setattr(book, field, record[field])
+            update_fields.append(field)
+    book.source_hash = new_hash
+    book.source_etag = etag
+
+    isbn = set(record['isbn'])
+    old_isbn = {
+        (num['isbn_type'], num['isbn_num']) for num in book.isbn_list
+    }
+    if isbn != old_isbn:
+        book.isbn_list = isbn_list(sorted(isbn))
+        update_fields.append('isbn_list')
+
+    try:
+        with transaction.atomic():
+            book.save(update_fields=update_fields)
+            if isbn != old_isbn:
+                book.book_isbn.all().delete()
+                IsbnModel.objects.bulk_create([
+                    IsbnModel(
+                        book_id=book.pk,
+                        isbn_type=isbn_type,
+                        isbn_num=isbn_num,
+                    )
+                    for isbn_type, isbn_num in sorted(isbn)
+                ])
+    except IntegrityError as e:
+        # changes would turn the book into duplicate of another one
+        print(e)
+        result.failed += 1
+        return
+
+    if len(update_fields) > 2:
+        result.updated += 1
+    else:
+        result.unchanged += 1
+
+
+def sync_books(chunk_size=200, start_id=0, limit=None, progress=None):
+    """
+    Re-sync stored books with Google Books using their self links.
+
+    Books are processed in chunks ordered by primary key. Details of all
+    books in a chunk are fetched in parallel with If-None-Match, so books
+    not modified since last sync cost a single 304 response. Books whose
+    details did change are compared field by field and saved with
+    update_fields limited to changed fields.
+    :param chunk_size: number of books fetched at once
+    :param start_id: primary key to resume from
+    :param limit: max number of books to check
+    :param progress: optional callable receiving SyncResult and last
+        processed primary key after every chunk
+    :return: SyncResult
+    """
+    result = SyncResult()
+    last_id = start_id
+    workers = settings.GOOGLE_BOOKS_MAX_WORKERS
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while limit is None or result.checked < limit:
+            size = chunk_size
+            if limit is not None:
+                size = min(size, limit - result.checked)
+
+            books = list(
+                BookModel.objects.filter(
+                    pk__gt=last_id,
+                    self_link__isnull=False,
+                ).exclude(
+                    self_link='',
+                ).order_by('pk')[:size]
+            )
+            if not books:
+                break
+
+            for book, fetched in zip(books, executor.map(_fetch, books)):
+                result.checked += 1
+                if fetched is None:
+                    result.failed += 1
+                    continue
+                volume, etag = fetched
+                if volume is None:
+                    result.not_modified += 1
+                    continue
+                sync_book(book, volume, etag, result)
+
+            last_id = books[-1].pk
+            if progress:
+                progress(result, last_id)
+
+    return result
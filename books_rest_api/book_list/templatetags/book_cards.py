@@ -0,0 +1,27 @@
+from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from book_list.caching import LRUCache
+
+register = template.Library()
+
+# rendered book cards keyed with book id and row version
+card_cache = LRUCache(settings.BOOK_CARD_CACHE_SIZE)
+
+
+@register.simple_tag
+def book_card(book):
+    """
+    Render book card (book_card.html). Rendered cards are cached until
+    the book changes - saving a book bumps its row_version.
+    :param book: BookModel
+    :return: card html
+    """
+    key = (book.pk, book.row_version)
+    html = card_cache.get(key)
+    if html is None:
+        html = render_to_string('book_card.html', {'book': book})
+        card_cache.set(key, html)
+    return mark_safe(html)
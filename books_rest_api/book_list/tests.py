@@ -1,13 +1,39 @@
+import io
+import json
+from datetime import date, timedelta
+from importlib import import_module
+
 import pytest
+from django.apps import apps
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 
-from book_list.models import BookModel, IsbnModel
+from book_list import catalog, google_books, importer
+from book_list.bulk_import import import_file
+from book_list.dates import parse_pub_date, period_end
+from book_list.fake_google_books import FakeGoogleBooks, isbn_13
+from book_list.models import (
+    BookChange,
+    BookModel,
+    CatalogStats,
+    ImportJob,
+    IsbnModel,
+)
+from book_list.pagination import CatalogPaginator, Keyset
+from book_list.search import prefix_terms, result_cache
+from book_list.serializers import BookSerializer
+from book_list.sync import sync_books
+from book_list.throttling import CircuitOpenError, RequestScheduler
 from book_list.views import (
     BookListView,
     AddBookView,
     ImportBooksView,
-    BookViewSet,
+    BooksAPIViewSet,
 )
 
 
@@ -29,7 +55,7 @@ def test_urls():
 
     # rest api view
     found = resolve(reverse('books_api'))
-    assert found.func.view_class == BookViewSet
+    assert found.func.view_class == BooksAPIViewSet
 
 
 @pytest.mark.django_db
@@ -84,6 +110,31 @@ def test_book_search_by_keyword(client, example_books):
     assert response.context['books'][0].author == 'Dan Abnett'
 
 
+@pytest.mark.django_db
+def test_book_search_by_partial_word(client, example_books):
+    """
+    Test book search finds books by beginning of a word
+    :param client:
+    :param example_books:
+    """
+    assert prefix_terms('Warriors  o\'God!') == 'warriors:* & o:* & god:*'
+    assert prefix_terms('--') == ''
+
+    response = client.post('/',
+                           {
+                               'search': 'Titani',
+                           })
+    assert response.status_code == 200
+    assert [book.title for book in response.context['books']] == [
+        'Titanicus',
+    ]
+
+    response = client.get('/books/api/', {'search': 'Sapkow'})
+    assert [book['title'] for book in response.data['results']] == [
+        'Warriors of God',
+    ]
+
+
 @pytest.mark.django_db
 def test_book_search_by_date_from(client, example_books):
     """
@@ -165,18 +216,1122 @@ def test_manual_add_book(client):
 
 
 @pytest.mark.django_db
-def test_book_api_import(client):
+def test_book_api_import(client, settings):
     """
     test importing books from Google Books API
+    (local stand-in server, see FakeGoogleBooks)
     :param client:
+    :param settings:
     """
+    settings.IMPORT_JOBS_RUN_INLINE = True
     assert len(BookModel.objects.all()) == 0
-    response = client.post('/import/',
-                           {
-                               'search_isbn': '837576325X'
-                           })
+    with FakeGoogleBooks(total=1) as server:
+        settings.GOOGLE_BOOKS_API_URL = server.url
+        response = client.post('/import/',
+                               {
+                                   'search_isbn': '837576325X'
+                               })
 
     assert response.status_code == 200
     assert response.context['conf_msg'] == 'Books imported: 1'
     assert len(BookModel.objects.all()) == 1
-    assert BookModel.objects.last().author == 'Jakub Bobrowski'
+    assert BookModel.objects.last().author == 'Author 0, Author 0'
+
+
+def test_fetch_large_covers(monkeypatch):
+    """
+    Test looking up large covers concurrently - failed lookups
+    should not affect other volumes.
+    :param monkeypatch:
+    """
+    def fake_get_json(url):
+        if url.endswith('broken'):
+            raise ValueError('broken volume')
+        return {'volumeInfo': {'imageLinks': {'large': url + '/large'}}}
+
+    monkeypatch.setattr(google_books, 'get_json', fake_get_json)
+    covers = google_books.fetch_large_covers([
+        {'selfLink': 'http://books/1'},
+        {'selfLink': 'http://books/broken'},
+        {'volumeInfo': {}},
+    ])
+
+    assert covers == {
+        'http://books/1': 'http://books/1/large',
+        'http://books/broken': None,
+    }
+
+
+def test_iter_volume_pages(monkeypatch):
+    """
+    Test fetching all pages of Google Books search results.
+    :param monkeypatch:
+    """
+    requested = []
+
+    def fake_search_volumes(query, start_index=0):
+        requested.append(start_index)
+        items = [{'id': i} for i in range(start_index, min(start_index + 40, 130))]
+        return {'totalItems': 130, 'items': items}
+
+    monkeypatch.setattr(google_books, 'search_volumes', fake_search_volumes)
+
+    pages = list(google_books.iter_volume_pages('intitle:"test"'))
+    assert len(pages) == 1
+
+    requested.clear()
+    pages = list(google_books.iter_volume_pages('intitle:"test"', all_pages=True))
+    assert sorted(requested) == [0, 40, 80, 120]
+    assert sum(len(page) for page in pages) == 130
+
+
+@pytest.mark.django_db
+def test_import_job_queue(client, monkeypatch):
+    """
+    Test queueing import job, running it by worker and checking its status.
+    :param client:
+    :param monkeypatch:
+    """
+    def fake_import_books(query, all_pages=False, progress=None):
+        result = importer.ImportResult(fetched=3, inserted=2, skipped=1)
+        progress(result)
+        return result
+
+    monkeypatch.setattr(importer, 'import_books', fake_import_books)
+
+    response = client.post('/import/', {'search_author': 'Abnett'})
+    assert response.status_code == 200
+    assert response.context['conf_msg'] == 'Import queued'
+    job = response.context['job']
+
+    response = client.get(reverse('import_job', args=[job.pk]))
+    assert response.json()['status'] == ImportJob.QUEUED
+
+    call_command('run_import_worker', '--once')
+
+    response = client.get(reverse('import_job', args=[job.pk]))
+    assert response.json()['status'] == ImportJob.DONE
+    assert response.json()['inserted'] == 2
+    assert response.json()['skipped'] == 1
+    assert response.json()['finished']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('bulk', [True, False])
+def test_import_page(example_books, monkeypatch, bulk):
+    """
+    Test storing page of imported volumes - books already in db and
+    repeated volumes should be skipped, ISBNs linked to new books.
+    :param example_books:
+    :param monkeypatch:
+    :param bulk:
+    """
+    monkeypatch.setattr(importer, 'fetch_large_covers', lambda volumes: {})
+    new_volume = {
+        'selfLink': 'http://books/new',
+        'volumeInfo': {
+            'title': 'Horus Rising',
+            'authors': ['Dan Abnett'],
+            'publishedDate': '2006',
+            'language': 'en',
+            'pageCount': 416,
+            'industryIdentifiers': [
+                {'type': 'ISBN_13', 'identifier': '9781844162949'},
+                {'type': 'OTHER', 'identifier': 'UOM:39015'},
+            ],
+        },
+    }
+    old_volume = {
+        'volumeInfo': {
+            'title': 'Titanicus',
+            'authors': ['Dan Abnett'],
+            'publishedDate': '2018-07-26',
+            'language': 'en',
+        },
+    }
+    result = importer.ImportResult()
+    importer.import_page(
+        [new_volume, old_volume, new_volume, {'volumeInfo': {}}],
+        result,
+        bulk=bulk,
+    )
+
+    assert result.fetched == 4
+    assert result.inserted == 1
+    assert result.skipped == 2
+    assert result.failed == 1
+    assert BookModel.objects.count() == 4
+
+    book = BookModel.objects.get(title='Horus Rising')
+    assert book.pages == 416
+    assert [isbn.isbn_num for isbn in book.book_isbn.all()] == ['9781844162949']
+
+
+@pytest.mark.django_db
+def test_manual_add_duplicate_book(client, example_books):
+    """
+    Test adding a book which is already in db
+    :param client:
+    :param example_books:
+    """
+    response = client.post('/add_book/',
+                           {
+                               'title': 'Titanicus',
+                               'author': 'Dan Abnett',
+                               'pub_date': '2018-07-26',
+                               'pub_lang': 'en',
+                           })
+
+    assert response.status_code == 200
+    assert response.context['form'].non_field_errors()
+    assert BookModel.objects.count() == 3
+
+
+def test_google_books_response_cache(monkeypatch, settings):
+    """
+    Test serving Google Books responses from cache and revalidating them
+    with ETag once they get stale.
+    :param monkeypatch:
+    :param settings:
+    """
+    calls = []
+
+    class FakeResponse:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.headers = {'ETag': '"v1"'}
+
+        def json(self):
+            return {'totalItems': 1}
+
+    def fake_get(url, headers=None, timeout=None):
+        calls.append(headers)
+        return FakeResponse(304 if headers else 200)
+
+    monkeypatch.setattr(google_books.session, 'get', fake_get)
+
+    url = 'http://books/volumes?q=test'
+    assert google_books.get_json(url) == {'totalItems': 1}
+    assert google_books.get_json(url) == {'totalItems': 1}
+    assert calls == [{}]
+
+    settings.GOOGLE_BOOKS_CACHE_TTL = 0
+    assert google_books.get_json(url) == {'totalItems': 1}
+    assert calls == [{}, {'If-None-Match': '"v1"'}]
+
+
+@pytest.mark.django_db
+def test_import_from_fake_google_books(settings):
+    """
+    Test importing all pages of results from local Google Books stand-in
+    :param settings:
+    """
+    with FakeGoogleBooks(total=90) as server:
+        settings.GOOGLE_BOOKS_API_URL = server.url
+        result = importer.import_books('intitle:"test"', all_pages=True)
+
+    assert result.fetched == 90
+    assert result.inserted == 90
+    assert BookModel.objects.count() == 90
+    assert IsbnModel.objects.count() == 180
+    book = BookModel.objects.get(title='Synthetic Book 7')
+    assert book.large_cover.endswith('/large.jpg')
+
+
+def test_request_scheduler_retries():
+    """
+    Test retrying throttled and failed requests and opening circuit
+    breaker after too many failures.
+    """
+    class FakeResponse:
+        def __init__(self, status_code, headers=None):
+            self.status_code = status_code
+            self.headers = headers or {}
+
+    class FakeSession:
+        def __init__(self, responses):
+            self.responses = responses
+            self.calls = 0
+
+        def get(self, url, **kwargs):
+            self.calls += 1
+            return self.responses.pop(0)
+
+    session = FakeSession([
+        FakeResponse(429, {'Retry-After': '0'}),
+        FakeResponse(503),
+        FakeResponse(200),
+    ])
+    scheduler = RequestScheduler(
+        session,
+        rate=100,
+        burst=10,
+        max_retries=4,
+        backoff_base=0.01,
+        backoff_max=1,
+        breaker_threshold=2,
+        breaker_reset=60,
+    )
+    assert scheduler.get('http://books').status_code == 200
+    assert session.calls == 3
+    assert scheduler.bucket.rate < 100
+
+    session.responses = [FakeResponse(503), FakeResponse(503)]
+    with pytest.raises(CircuitOpenError):
+        scheduler.get('http://books')
+    assert session.calls == 5
+
+
+@pytest.mark.django_db
+def test_sync_books(settings):
+    """
+    Test re-syncing imported books with Google Books - only books changed
+    since last sync should be written.
+    :param settings:
+    """
+    with FakeGoogleBooks(total=5) as server:
+        settings.GOOGLE_BOOKS_API_URL = server.url
+        importer.import_books('intitle:"test"')
+
+        result = sync_books(chunk_size=2)
+        assert result.checked == 5
+        assert result.unchanged == 5
+
+        book = BookModel.objects.get(title='Synthetic Book 3')
+        BookModel.objects.filter(pk=book.pk).update(
+            title='Changed Title',
+            pages=None,
+            source_etag=None,
+            source_hash=None,
+        )
+        result = sync_books()
+        assert result.not_modified == 4
+        assert result.updated == 1
+
+    book.refresh_from_db()
+    assert book.title == 'Synthetic Book 3'
+    assert book.pages == 103
+
+
+@pytest.mark.django_db
+def test_import_books_file(tmp_path, example_books):
+    """
+    Test importing books from NDJSON and CSV files
+    :param tmp_path:
+    :param example_books:
+    """
+    fake = FakeGoogleBooks(total=3)
+    ndjson = tmp_path / 'books.ndjson'
+    ndjson.write_text('\n'.join([
+        json.dumps({
+            'title': 'Horus Rising',
+            'author': 'Dan Abnett',
+            'pub_date': '2006',
+            'isbn': [{'isbn_type': 'ISBN_13', 'isbn_num': '9781844162949'}],
+        }),
+        json.dumps({'title': 'Titanicus', 'author': 'Dan Abnett',
+                    'pub_date': '2018-07-26', 'pub_lang': 'en'}),
+        json.dumps(fake.search(0, 40)),
+        json.dumps({'title': 'Bad ISBN', 'isbn': ['9781844162940']}),
+        json.dumps({'title': 'Bad check character', 'isbn': ['184416156a']}),
+        'not json',
+    ]))
+    fake.stop()
+
+    call_command('import_books_file', str(ndjson), '--chunk-size', '2')
+    assert BookModel.objects.count() == 3 + 4
+    book = BookModel.objects.get(title='Horus Rising')
+    assert book.book_isbn.get().isbn_num == '9781844162949'
+    assert BookModel.objects.get(title='Synthetic Book 2').book_isbn.count() == 2
+
+    csv_file = tmp_path / 'books.csv'
+    csv_file.write_text(
+        'title,author,pub_date,pages,isbn_10,isbn\n'
+        'Eisenhorn,Dan Abnett,2001,200,1844161560,\n'
+        'Eisenhorn,Dan Abnett,2001,200,1844161560,\n'
+        'Ravenor,Dan Abnett,2004,,,978-1-84416-073-0\n'
+        'Xenos,Dan Abnett,2001,,184416156a,\n'
+    )
+    call_command('import_books_file', str(csv_file))
+    assert BookModel.objects.count() == 3 + 4 + 2
+    assert BookModel.objects.get(title='Ravenor').book_isbn.get().isbn_type \
+        == 'ISBN_13'
+    assert not BookModel.objects.filter(title='Xenos').exists()
+
+
+@pytest.mark.django_db
+def test_import_books_file_copy(tmp_path):
+    """
+    Test importing books with COPY in several chunks
+    :param tmp_path:
+    """
+    if connection.vendor != 'postgresql':
+        pytest.skip('COPY is only used on PostgreSQL')
+
+    fake = FakeGoogleBooks(total=5)
+    ndjson = tmp_path / 'books.ndjson'
+    ndjson.write_text('\n'.join(
+        json.dumps(fake.volume(num)) for num in [0, 1, 2, 2, 3, 4]
+    ))
+    fake.stop()
+
+    with ndjson.open() as lines:
+        result = import_file(lines, 'ndjson', chunk_size=2, use_copy=True)
+
+    assert result.inserted == 5
+    assert result.skipped == 1
+    assert BookModel.objects.count() == 5
+    assert IsbnModel.objects.count() == 10
+
+
+def test_request_scheduler_throttled_trial():
+    """
+    Test throttled trial request closing half-open circuit breaker, so
+    requests are not blocked for good.
+    """
+    class FakeResponse:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.headers = {'Retry-After': '0'}
+
+    class FakeSession:
+        def __init__(self, statuses):
+            self.statuses = statuses
+
+        def get(self, url, **kwargs):
+            return FakeResponse(self.statuses.pop(0))
+
+    session = FakeSession([503, 503])
+    scheduler = RequestScheduler(
+        session,
+        rate=100,
+        burst=10,
+        max_retries=1,
+        backoff_base=0.01,
+        backoff_max=1,
+        breaker_threshold=2,
+        breaker_reset=0,
+    )
+    assert scheduler.get('http://books').status_code == 503
+
+    session.statuses = [429, 200]
+    assert scheduler.get('http://books').status_code == 200
+    assert not scheduler.breaker.trial
+    assert scheduler.breaker.opened_at is None
+
+
+def test_parse_volume_fits_columns():
+    """
+    Test oversized volume values being made to fit db columns.
+    """
+    record = importer.parse_volume({
+        'selfLink': 'http://books/' + 'x' * 600,
+        'volumeInfo': {
+            'title': 'T' * 300,
+            'authors': ['Author'] * 60,
+            'publishedDate': '2006-05-01T00:00:00',
+        },
+    })
+
+    assert len(record['title']) == 255
+    assert len(record['author']) == 255
+    assert record['pub_date'] == '2006-05-01'
+    assert record['self_link'] is None
+
+
+@pytest.mark.django_db
+def test_requeue_stale_import_jobs(settings):
+    """
+    Test taking over jobs left running by a dead worker.
+    :param settings:
+    """
+    settings.IMPORT_JOBS_STALE_AFTER = 60
+    stale = timezone.now() - timedelta(minutes=5)
+    job = ImportJob.objects.create(query='intitle:"a"')
+    job_to_fail = ImportJob.objects.create(query='intitle:"b"')
+    active_job = ImportJob.objects.create(query='intitle:"c"')
+    ImportJob.objects.filter(pk__in=[job.pk, job_to_fail.pk]).update(
+        status=ImportJob.RUNNING,
+        updated_at=stale,
+        attempts=1,
+    )
+    ImportJob.objects.filter(pk=job_to_fail.pk).update(attempts=3)
+    ImportJob.objects.filter(pk=active_job.pk).update(
+        status=ImportJob.RUNNING,
+    )
+
+    assert importer.requeue_stale_jobs() == 2
+
+    job.refresh_from_db()
+    job_to_fail.refresh_from_db()
+    active_job.refresh_from_db()
+    assert job.status == ImportJob.QUEUED
+    assert job_to_fail.status == ImportJob.FAILED
+    assert active_job.status == ImportJob.RUNNING
+    assert importer.claim_next_job().attempts == 2
+
+
+@pytest.mark.django_db
+def test_merge_duplicate_books():
+    """
+    Test merging duplicates left without fingerprint by migration 0008.
+    """
+    migration = import_module(
+        'book_list.migrations.0011_merge_duplicate_books',
+    )
+    book = BookModel.objects.create(title='Dune', author='Frank Herbert')
+    IsbnModel.objects.create(book=book, isbn_type='ISBN_10', isbn_num='1')
+    duplicate = BookModel.objects.create(title='Dune Messiah')
+    IsbnModel.objects.create(book=duplicate, isbn_type='ISBN_10', isbn_num='1')
+    IsbnModel.objects.create(
+        book=duplicate,
+        isbn_type='ISBN_13',
+        isbn_num='2',
+    )
+    BookModel.objects.filter(pk=duplicate.pk).update(
+        title='Dune',
+        author='Frank Herbert',
+        fingerprint=None,
+        pages=412,
+    )
+
+    migration.merge_duplicates(apps, None)
+
+    assert not BookModel.objects.filter(pk=duplicate.pk).exists()
+    book.refresh_from_db()
+    assert book.pages == 412
+    assert sorted(
+        book.book_isbn.values_list('isbn_type', 'isbn_num')
+    ) == [('ISBN_10', '1'), ('ISBN_13', '2')]
+
+
+@pytest.mark.django_db
+def test_book_api_search(client, example_books):
+    """
+    Test API search uses book list search engine.
+    :param client:
+    :param example_books:
+    """
+    response = client.get('/books/api/', {'search': '  Dan   Abnett '})
+    assert response.status_code == 200
+    assert [book['title'] for book in response.data['results']] == [
+        'Titanicus',
+    ]
+
+    response = client.get('/books/api/', {
+        'search': 'pl',
+        'ordering': '-title',
+    })
+    assert [book['title'] for book in response.data['results']] == [
+        'Warriors of God',
+        'Mitologia Słowiańska',
+    ]
+
+
+@pytest.mark.django_db
+def test_keyset_pagination(client, example_books):
+    """
+    Test walking book list with keyset cursors both ways.
+    :param client:
+    :param example_books:
+    """
+    BookModel.objects.create(title='Anonymous book')
+    keyset = Keyset('author', 'title', 'pub_date')
+
+    page = keyset.page(BookModel.objects.all(), 2)
+    assert [book.title for book in page] == [
+        'Anonymous book',
+        'Warriors of God',
+    ]
+    assert page.has_next and not page.has_previous
+
+    page = keyset.page(BookModel.objects.all(), 2, after=page.next_cursor)
+    assert [book.title for book in page] == ['Titanicus', 'Mitologia Słowiańska']
+    assert page.has_previous and not page.has_next
+
+    page = keyset.page(
+        BookModel.objects.all(),
+        2,
+        before=page.previous_cursor,
+    )
+    assert [book.title for book in page] == [
+        'Anonymous book',
+        'Warriors of God',
+    ]
+    assert not page.has_previous
+
+    # broken cursor gives first page
+    response = client.get('/', {'after': 'broken', 'count': 1})
+    assert response.context['books'][0].title == 'Anonymous book'
+    assert response.context['total'] == 4
+
+    response = client.get('/books/api/')
+    assert response.data['count'] is None
+    assert response.data['next'] is None
+    assert response.data['results'][0]['title'] == 'Anonymous book'
+    response = client.get('/books/api/', {'page': 1})
+    assert response.data['count'] == 4
+
+
+@pytest.mark.django_db
+def test_catalog_book_count(example_books):
+    """
+    Test book counter kept up to date on writes and used by paginator.
+    :param example_books:
+    """
+    assert catalog.get_stats().book_count == 3
+
+    book = BookModel.objects.create(title='Horus Rising')
+    importer.save_books([{
+        'title': 'Legion',
+        'author': 'Dan Abnett',
+        'pub_date': None,
+        'pub_lang': 'en',
+        'pages': None,
+        'cover_link': None,
+        'self_link': None,
+        'large_cover': None,
+        'isbn': [],
+    }])
+    assert catalog.book_count() == 5
+    book.delete()
+    assert catalog.book_count() == 4
+
+    # counter is off on purpose to see it is used instead of COUNT(*)
+    CatalogStats.objects.update(book_count=250)
+    paginator = CatalogPaginator(BookModel.objects.order_by('pk'), 10)
+    assert paginator.count == 250
+    assert paginator.page_window(12) == [
+        1, paginator.ELLIPSIS, 10, 11, 12, 13, 14, paginator.ELLIPSIS, 25,
+    ]
+    filtered = CatalogPaginator(
+        BookModel.objects.filter(pub_lang='pl').order_by('pk'),
+        10,
+    )
+    assert filtered.count == 2
+
+
+@pytest.mark.django_db
+def test_book_search_get_cached(client, example_books):
+    """
+    Test GET search keeps result ids cached until catalog changes.
+    :param client:
+    :param example_books:
+    """
+    response = client.get('/', {'search': ' pl ', 'date_from': '2017'})
+    assert [book.title for book in response.context['books']] == [
+        'Warriors of God',
+        'Mitologia Słowiańska',
+    ]
+    assert response.context['query'] == 'search=pl&date_from=2017'
+
+    stats = catalog.get_stats()
+    key = ('pl', '2017', '', stats.version)
+    assert result_cache.get(key) == [example_books[0].pk, example_books[1].pk]
+
+    BookModel.objects.create(title='Pan Tadeusz', pub_lang='pl')
+    response = client.get('/', {'search': 'pl', 'date_from': '2017'})
+    assert len(response.context['books']) == 2
+    response = client.get('/', {'search': 'pl'})
+    assert len(response.context['books']) == 3
+    assert catalog.catalog_version() > stats.version
+
+
+@pytest.mark.django_db
+def test_pub_date_range(client, example_books):
+    """
+    Test normalized publication date and API date range filter.
+    :param client:
+    :param example_books:
+    """
+    assert parse_pub_date('2017') == (date(2017, 1, 1), 'year')
+    assert parse_pub_date('2017-02') == (date(2017, 2, 1), 'month')
+    assert parse_pub_date('2017-02-30') == (None, None)
+    assert period_end('2016-02') == date(2016, 2, 29)
+
+    book = example_books[1]
+    assert book.pub_date_value == date(2017, 1, 1)
+    book.pub_date = '2016-05'
+    book.save(update_fields=['pub_date'])
+    book.refresh_from_db()
+    assert book.pub_date_value == date(2016, 5, 1)
+    assert book.pub_date_precision == 'month'
+
+    response = client.get('/books/api/', {
+        'date_from': '2016-05',
+        'date_to': '2018',
+    })
+    assert [book['title'] for book in response.data['results']] == [
+        'Mitologia Słowiańska',
+        'Titanicus',
+    ]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('books', [3, 30])
+def test_book_list_query_budget(client, django_assert_num_queries, books):
+    """
+    Test list pages run the same number of queries whatever the number
+    of books on them.
+    :param client:
+    :param django_assert_num_queries:
+    :param books: number of books in db
+    """
+    for num in range(books):
+        book = BookModel.objects.create(title=f'Book {num}')
+        IsbnModel.objects.create(
+            book=book,
+            isbn_type='ISBN_13',
+            isbn_num=f'978{num:010d}',
+        )
+    catalog.get_stats()
+
+    # catalog stats (ETag), catalog stats (count), books - ISBN numbers
+    # are stored on books
+    with django_assert_num_queries(3):
+        response = client.get('/')
+    assert response.context['books'][0].isbn_list[0]['isbn_num']
+    assert b'ISBN_13:</strong> 978' in response.content
+    with django_assert_num_queries(3):
+        client.get('/', {'page': 1})
+    # catalog stats (ETag), books
+    with django_assert_num_queries(2):
+        response = client.get('/books/api/')
+    assert response.data['results'][0]['isbn'] == [{
+        'isbn_type': 'ISBN_13',
+        'isbn_num': '9780000000000',
+    }]
+    # catalog stats (ETag), catalog stats (cache key), book ids, books
+    with django_assert_num_queries(4):
+        client.get('/', {'search': 'Book'})
+
+
+@pytest.mark.django_db
+def test_isbn_list_kept_in_sync(client, example_books):
+    """
+    Test ISBN numbers stored on books follow edits and can be rebuilt.
+    :param client:
+    :param example_books:
+    """
+    book = example_books[2]
+    response = client.post(f'/edit/{book.pk}/', {
+        'title': book.title,
+        'author': book.author,
+        'pub_date': book.pub_date,
+        'pub_lang': book.pub_lang,
+        'isbn_10': '837576325X',
+        'isbn_13': '9781784968168',
+    })
+    assert response.status_code == 302
+    book.refresh_from_db()
+    assert book.isbn_list == [
+        {'isbn_type': 'ISBN_10', 'isbn_num': '837576325X'},
+        {'isbn_type': 'ISBN_13', 'isbn_num': '9781784968168'},
+    ]
+
+    BookModel.objects.filter(pk=book.pk).update(isbn_list=[])
+    call_command('rebuild_isbn_lists', stdout=io.StringIO())
+    book.refresh_from_db()
+    assert len(book.isbn_list) == 2
+    assert example_books[0].isbn_list == []
+
+    # ISBN numbers written outside of the views (admin, shell, fixtures)
+    other = example_books[0]
+    row_version = BookModel.objects.get(pk=other.pk).row_version
+    isbn = IsbnModel.objects.create(
+        book=other,
+        isbn_type='ISBN_13',
+        isbn_num='9780316423724',
+    )
+    other.refresh_from_db()
+    assert other.isbn_list == [
+        {'isbn_type': 'ISBN_13', 'isbn_num': '9780316423724'},
+    ]
+    assert other.row_version == row_version + 1
+    isbn.delete()
+    other.refresh_from_db()
+    assert other.isbn_list == []
+
+
+@pytest.mark.django_db
+def test_book_list_conditional_get(client, django_assert_num_queries,
+                                   example_books):
+    """
+    Test unchanged book list and API pages are answered with 304.
+    :param client:
+    :param django_assert_num_queries:
+    :param example_books:
+    """
+    for url in ['/', '/books/api/?format=json']:
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert response.headers['Last-Modified']
+
+        with django_assert_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        BookModel.objects.create(title=f'New book for {url}')
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    api_etag = client.get('/books/api/').headers['ETag']
+    html_etag = client.get('/books/api/', HTTP_ACCEPT='text/html')
+    assert html_etag.headers['ETag'] != api_etag
+
+
+@pytest.mark.django_db
+def test_book_card_cache(client, example_books):
+    """
+    Test rendered book cards are reused until the book changes.
+    :param client:
+    :param example_books:
+    """
+    client.get('/')
+    client.get('/')
+    stats = client.get('/books/cache-stats/').json()
+    assert stats['misses'] == 3
+    assert stats['hits'] == 3
+
+    book = example_books[2]
+    book.title = 'Titanicus (2nd edition)'
+    book.save()
+    response = client.get('/')
+    assert b'Titanicus (2nd edition)' in response.content
+    assert client.get('/books/cache-stats/').json()['misses'] == 4
+
+    # concurrent saves of the same book get different row versions
+    copy = BookModel.objects.get(pk=book.pk)
+    book.pages = 600
+    book.save()
+    copy.title = 'Titanicus'
+    copy.save()
+    assert copy.row_version == book.row_version + 1
+    response = client.get('/')
+    assert b'Titanicus (2nd edition)' not in response.content
+
+
+@pytest.mark.django_db
+def test_book_change_feed(client, settings, example_books):
+    """
+    Test reading changed books after a cursor.
+    :param client:
+    :param settings:
+    :param example_books:
+    """
+    settings.BOOK_CHANGES_DELAY = 0
+    response = client.get('/books/api/changes/')
+    assert [change['id'] for change in response.data['changes']] == [
+        book.pk for book in example_books
+    ]
+    assert response.data['changes'][0]['action'] == 'created'
+    cursor = response.data['cursor']
+
+    response = client.get('/books/api/changes/', {'since': cursor})
+    assert response.data['changes'] == []
+    assert response.data['cursor'] == cursor
+
+    example_books[0].pages = 700
+    example_books[0].save()
+    example_books[0].save()
+    deleted_id = example_books[1].pk
+    example_books[1].delete()
+    importer.save_books([{
+        'title': 'Legion',
+        'author': 'Dan Abnett',
+        'pub_date': None,
+        'pub_lang': 'en',
+        'pages': None,
+        'cover_link': None,
+        'self_link': None,
+        'large_cover': None,
+        'isbn': [],
+    }])
+
+    response = client.get('/books/api/changes/', {'since': cursor})
+    changes = response.data['changes']
+    assert [(change['id'], change['action']) for change in changes] == [
+        (example_books[0].pk, 'updated'),
+        (deleted_id, 'deleted'),
+        (BookModel.objects.get(title='Legion').pk, 'created'),
+    ]
+    assert changes[0]['book']['pages'] == 700
+    assert changes[1]['book'] is None
+    assert not response.data['has_more']
+
+    settings.BOOK_CHANGES_DELAY = 60
+    example_books[2].save()
+    response = client.get('/books/api/changes/', {
+        'since': response.data['cursor'],
+    })
+    assert response.data['changes'] == []
+
+
+@pytest.mark.django_db
+def test_export_books(client, tmp_path, example_books, isbn_number):
+    """
+    Test streaming catalog export and importing it back.
+    :param client:
+    :param tmp_path:
+    :param example_books:
+    :param isbn_number:
+    """
+    call_command('rebuild_isbn_lists', stdout=io.StringIO())
+
+    response = client.get('/books/api/export/')
+    assert response['Content-Type'] == 'application/x-ndjson'
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    books = [json.loads(line) for line in lines]
+    assert [book['title'] for book in books] == [
+        book.title for book in example_books
+    ]
+    assert books[0]['isbn'] == [
+        {'isbn_type': 'ISBN_13', 'isbn_num': '9780316423724'},
+        {'isbn_type': 'ISBN_10', 'isbn_num': '0316423726'},
+    ]
+
+    response = client.get('/books/api/export/', {'format': 'csv'})
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    assert lines[0] == 'id,title,author,pub_date,pub_lang,pages,' \
+                       'cover_link,self_link,large_cover,isbn_10,isbn_13,isbn'
+    assert lines[2].endswith(',837576325X,9788375763256,')
+
+    path = tmp_path / 'books.csv'
+    call_command('export_books', str(path), format='csv', chunk_size=2)
+    BookModel.objects.all().delete()
+    call_command('import_books_file', str(path), stdout=io.StringIO())
+    assert BookModel.objects.count() == 3
+    assert IsbnModel.objects.count() == 5
+
+
+@pytest.mark.django_db
+def test_book_api_sparse_fields(client, example_books):
+    """
+    Test ?fields= and ?exclude= narrow API output and loaded columns.
+    :param client:
+    :param example_books:
+    """
+    response = client.get('/books/api/', {'fields': 'pages, title'})
+    assert response.status_code == 200
+    assert response.data['results'][0] == {
+        'title': 'Mitologia Słowiańska',
+        'pages': 160,
+    }
+
+    response = client.get('/books/api/', {
+        'fields': 'title,isbn,pages',
+        'exclude': 'pages',
+    })
+    assert list(response.data['results'][0]) == ['title', 'isbn']
+
+    response = client.get('/books/api/', {'exclude': 'isbn'})
+    assert 'isbn' not in response.data['results'][0]
+    assert 'large_cover' in response.data['results'][0]
+
+    response = client.get('/books/api/', {'fields': 'title,price'})
+    assert response.status_code == 400
+    assert 'price' in str(response.data['fields'])
+
+    with CaptureQueriesContext(connection) as queries:
+        client.get('/books/api/', {'fields': 'title'})
+    select = [
+        query['sql'] for query in queries.captured_queries
+        if 'book_list_bookmodel' in query['sql'] and
+        query['sql'].startswith('SELECT')
+    ][-1]
+    assert 'pages' not in select and 'isbn_list' not in select
+
+
+@pytest.mark.django_db
+def test_book_row_serializer(client, example_books, isbn_number):
+    """
+    Test books API output built from values() rows matches BookSerializer.
+    :param client:
+    :param example_books:
+    :param isbn_number:
+    """
+    call_command('rebuild_isbn_lists', stdout=io.StringIO())
+    books = BookModel.objects.order_by('title', 'author', 'pub_date')
+    expected = JSONRenderer().render(BookSerializer(books, many=True).data)
+
+    response = client.get('/books/api/')
+    assert JSONRenderer().render(response.data['results']) == expected
+
+    # keyset cursor is read from values() row
+    for num in range(10):
+        BookModel.objects.create(title=f'Book {num}')
+    response = client.get('/books/api/')
+    response = client.get(response.data['next'])
+    assert [book['title'] for book in response.data['results']] == [
+        'Mitologia Słowiańska',
+        'Titanicus',
+        'Warriors of God',
+    ]
+
+    out = io.StringIO()
+    call_command('benchmark_serializers', sizes=[5], repeat=1, stdout=out)
+    assert out.getvalue().splitlines()[1].endswith('yes')
+
+
+@pytest.mark.django_db
+def test_book_lookup(client, django_assert_num_queries, example_books,
+                     isbn_number, settings):
+    """
+    Test looking up many books by ids and ISBN numbers at once.
+    :param client:
+    :param django_assert_num_queries:
+    :param example_books:
+    :param isbn_number:
+    :param settings:
+    """
+    book1, book2, book3 = example_books
+    # mapping doesn't depend on denormalized isbn_list
+    BookModel.objects.filter(pk=book2.pk).update(isbn_list=[])
+
+    # ISBN owners, books
+    with django_assert_num_queries(2):
+        response = client.post(
+            '/books/api/lookup/?fields=title',
+            {
+                'ids': [book3.pk, str(book1.pk), 999999, 'abc'],
+                'isbn': ['978-0-316-42372-4', '837576325x', '9780000000002',
+                         '1234', '123456789a'],
+            },
+            content_type='application/json',
+        )
+    assert response.status_code == 200
+    assert response.json() == {
+        'ids': {
+            str(book3.pk): {'title': 'Titanicus'},
+            str(book1.pk): {'title': book1.title},
+            '999999': None,
+        },
+        'isbn': {
+            '978-0-316-42372-4': {'title': book1.title},
+            '837576325x': {'title': 'Mitologia Słowiańska'},
+            '9780000000002': None,
+        },
+        'errors': {
+            'abc': 'Invalid book id.',
+            '1234': '1234 is not a valid isbn',
+            '123456789a': '123456789A is not a valid isbn',
+        },
+    }
+
+    settings.BOOK_LOOKUP_MAX_KEYS = 2
+    response = client.post(
+        '/books/api/lookup/',
+        {'ids': [1, 2], 'isbn': ['0316423726']},
+        content_type='application/json',
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_book_bulk_upsert(client, example_books, isbn_number):
+    """
+    Test creating and updating books in bulk through API.
+    :param client:
+    :param example_books:
+    :param isbn_number:
+    """
+    call_command('rebuild_isbn_lists', stdout=io.StringIO())
+    book1, book2, book3 = example_books
+    book1.refresh_from_db()
+    row_version = book1.row_version
+    stats = catalog.get_stats()
+    new_book = {
+        'title': 'Blood of Elves',
+        'author': 'Andrzej Sapkowski',
+        'pub_lang': 'en',
+        'pages': 320,
+        'isbn': [{'isbn_type': 'ISBN_13', 'isbn_num': isbn_13(1)}],
+    }
+
+    response = client.post('/books/api/bulk/', [
+        {
+            'title': 'Warriors of God',
+            'author': 'Andrzej Sapkowski',
+            'pub_date': '2021-10-19',
+            'pub_lang': 'pl',
+            'pages': 700,
+            'isbn': ['978-0-316-42372-4'],
+        },
+        {
+            'title': 'Titanicus',
+            'author': 'Dan Abnett',
+            'pub_date': '2018-07-26',
+            'pub_lang': 'en',
+            'pages': 512,
+            'isbn': [{'isbn_type': 'ISBN_13', 'isbn_num': '9781784968168'}],
+        },
+        new_book,
+        new_book,
+        {'title': 'Bad ISBN', 'isbn': ['1234']},
+        {
+            'title': 'Titanicus',
+            'author': 'Dan Abnett',
+            'pub_date': '2018-07-26',
+            'pub_lang': 'en',
+            'isbn': ['837576325X'],
+        },
+        {'title': ''},
+        {'title': 'Bad check character', 'isbn': ['123456789a']},
+    ], content_type='application/json')
+    assert response.status_code == 200
+    assert response.data['counts'] == {
+        'created': 1,
+        'updated': 1,
+        'unchanged': 1,
+        'invalid': 5,
+    }
+    results = response.data['results']
+    created = BookModel.objects.get(title='Blood of Elves')
+    assert results[:4] == [
+        {'status': 'updated', 'id': book1.pk},
+        {'status': 'unchanged', 'id': book3.pk},
+        {'status': 'created', 'id': created.pk},
+        {'status': 'invalid', 'errors': ['Book repeats item 2 of this batch.']},
+    ]
+    assert results[4]['errors'] == ['1234 is not a valid isbn']
+    assert results[5]['errors'] == [
+        f'Book {book3.pk} has the same title, author, language and '
+        f'publication date.'
+    ]
+    assert results[6]['status'] == 'invalid'
+    assert results[7] == {
+        'status': 'invalid',
+        'errors': ['123456789a is not a valid isbn'],
+    }
+
+    book1.refresh_from_db()
+    assert book1.pages == 700
+    assert book1.row_version == row_version + 1
+    assert book1.isbn_list == [
+        {'isbn_type': 'ISBN_13', 'isbn_num': '9780316423724'},
+    ]
+    assert list(book1.book_isbn.values_list('isbn_num', flat=True)) == [
+        '9780316423724',
+    ]
+    assert created.isbn_list == [
+        {'isbn_type': 'ISBN_13', 'isbn_num': isbn_13(1)},
+    ]
+    assert created.book_isbn.count() == 1
+    assert created.fingerprint and created.pub_date_value is None
+
+    updated_stats = catalog.get_stats()
+    assert updated_stats.book_count == stats.book_count + 1
+    assert updated_stats.version > stats.version
+    assert list(BookChange.objects.order_by('-id').values_list(
+        'book_id',
+        'action',
+    )[:2]) == [(book1.pk, 'updated'), (created.pk, 'created')]
+
+    response = client.post(
+        '/books/api/bulk/',
+        {'title': 'Not a list'},
+        content_type='application/json',
+    )
+    assert response.status_code == 400
@@ -0,0 +1,208 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from django.utils import timezone
+
+# statuses worth asking again for
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised instead of sending a request while circuit breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket limiting number of requests per second.
+
+    Rate adapts to upstream: slow_down halves it (not below min_rate),
+    every speed_up call adds `step` back (up to max_rate). Pause stops
+    handing out tokens for given number of seconds.
+    """
+
+    def __init__(self, rate, capacity, min_rate=None, step=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.step = step or rate / 20
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until request can be sent.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(
+                        self.capacity,
+                        self.tokens + (now - self.updated) * self.rate,
+                    )
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(
+                self.paused_until,
+                time.monotonic() + seconds,
+            )
+            self.tokens = 0
+
+    def slow_down(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def speed_up(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+
+class CircuitBreaker:
+    """
+    Stop sending requests after `threshold` failures in a row.
+
+    After `reset_timeout` seconds single trial request is let through -
+    success closes the circuit, failure keeps it open for another
+    `reset_timeout`.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        :raise: CircuitOpenError if request should not be sent
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self.trial or \
+                    time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError('Google Books circuit breaker is open')
+            self.trial = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+def retry_after(resp):
+    """
+    Read number of seconds to wait from Retry-After header.
+    :param resp: requests.Response
+    :return: seconds or None if header is missing or invalid
+    """
+    value = resp.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (date - timezone.now()).total_seconds())
+
+
+class RequestScheduler:
+    """
+    Sends all GET requests to an upstream API.
+
+    Requests are rate limited with TokenBucket, throttled (429) and
+    failed (5xx, connection errors) requests are retried with capped
+    exponential backoff with full jitter or after time given in
+    Retry-After header. CircuitBreaker stops hammering upstream which
+    keeps failing.
+    """
+
+    def __init__(self, session, rate, burst, max_retries, backoff_base,
+                 backoff_max, breaker_threshold, breaker_reset):
+        self.session = session
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt):
+        return random.uniform(
+            0,
+            min(self.backoff_max, self.backoff_base * 2 ** attempt),
+        )
+
+    def get(self, url, **kwargs):
+        """
+        Send GET request retrying it if needed.
+        :return: requests.Response (last one if retries run out)
+        :raise: requests.RequestException if no response was received
+        """
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            self.breaker.check()
+            self.bucket.acquire()
+
+            try:
+                resp = self.session.get(url, **kwargs)
+            except requests.RequestException:
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+
+            if resp.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                self.bucket.speed_up()
+                return resp
+
+            if resp.status_code == 429:
+                # upstream is fine, we are just too fast for it - this also
+                # settles half-open circuit's trial request
+                self.breaker.record_success()
+                self.bucket.slow_down()
+            else:
+                self.breaker.record_failure()
+            if last_attempt:
+                return resp
+
+            delay = retry_after(resp)
+            if delay is None:
+                delay = self.backoff(attempt)
+            else:
+                delay = min(delay, self.backoff_max)
+                # whole API asked us to wait, not just this request
+                self.bucket.pause(delay)
+            time.sleep(delay)
@@ -0,0 +1,199 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from book_list.bulk_import import BOOK_FIELDS, clean_record
+from book_list.catalog import catalog_changed, record_changes
+from book_list.importer import SAVE_ATTEMPTS, build_book
+from book_list.models import BookChange, BookModel, IsbnModel
+
+CREATED = 'created'
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+INVALID = 'invalid'
+
+# columns written when existing book is updated
+UPDATE_FIELDS = BOOK_FIELDS + (
+    'fingerprint',
+    'pub_date_value',
+    'pub_date_precision',
+    'isbn_list',
+    'row_version',
+    'updated_at',
+)
+
+
+def upsert_books(items):
+    """
+    Create or update books in a single transaction.
+
+    Every item holds BookModel fields and 'isbn' list (see
+    bulk_import.clean_record) and replaces all fields of the book it
+    matches. Item matches the book owning any of its ISBN numbers, or
+    else the book with the same fingerprint (title, author, language and
+    date). Unmatched items are created. Books are written with one bulk
+    insert and one bulk update, ISBN numbers of created books and of books
+    whose numbers changed are rewritten with bulk delete and insert.
+    Items which don't validate, repeat a book of earlier item or would
+    duplicate another book's fingerprint are reported and left out.
+    :param items: list of raw book records
+    :return: list of per-item results - dicts with 'status' (created,
+        updated, unchanged or invalid) and book 'id' or 'errors'
+    """
+    results = [None] * len(items)
+    books = []
+    for index, raw in enumerate(items):
+        try:
+            record = clean_record(raw)
+        except ValidationError as e:
+            results[index] = {'status': INVALID, 'errors': e.messages}
+            continue
+        books.append((index, build_book(record), record))
+
+    for attempt in range(SAVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                _upsert(books, results)
+            break
+        except IntegrityError:
+            # book with the same fingerprint added in the meantime
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
+            for index, book, record in books:
+                book.pk = None
+    return results
+
+
+def _delete_isbn_numbers(book_ids, batch_size=500):
+    """
+    Delete all ISBN numbers of given books with plain DELETE statements.
+    IsbnModel signals are skipped on purpose - they would rebuild
+    isbn_list of every book from rows which are about to be replaced and
+    log every number separately, catalog is updated once by the caller.
+    :param book_ids: ids of books
+    :param batch_size: number of books deleted with one statement
+    """
+    table = connection.ops.quote_name(IsbnModel._meta.db_table)
+    column = connection.ops.quote_name(
+        IsbnModel._meta.get_field('book').column,
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(book_ids), batch_size):
+            batch = book_ids[start:start + batch_size]
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {column} IN '
+                f'({", ".join(["%s"] * len(batch))})',
+                batch,
+            )
+
+
+def _invalid(message):
+    return {'status': INVALID, 'errors': [message]}
+
+
+def _upsert(books, results):
+    """
+    Match books with stored ones and write them.
+    :param books: list of (item index, unsaved BookModel, record)
+    :param results: list of item results filled in place
+    """
+    isbn_owners = dict(IsbnModel.objects.filter(
+        isbn_num__in={
+            isbn_num
+            for index, book, record in books
+            for isbn_type, isbn_num in record['isbn']
+        },
+    ).order_by('-pk').values_list('isbn_num', 'book_id'))
+    fingerprint_owners = dict(BookModel.objects.filter(
+        fingerprint__in={book.fingerprint for index, book, record in books},
+    ).values_list('fingerprint', 'id'))
+
+    # index of item which claimed given book id / fingerprint
+    claimed_ids = {}
+    claimed_fingerprints = {}
+    matched = {}
+    for index, book, record in books:
+        target = next((
+            isbn_owners[isbn_num]
+            for isbn_type, isbn_num in record['isbn']
+            if isbn_num in isbn_owners
+        ), None)
+        owner = fingerprint_owners.get(book.fingerprint)
+        if target is None:
+            target = owner
+        elif owner not in (None, target):
+            results[index] = _invalid(
+                f'Book {owner} has the same title, author, language and '
+                f'publication date.'
+            )
+            continue
+
+        repeated = claimed_ids.get(target)
+        if repeated is None:
+            repeated = claimed_fingerprints.get(book.fingerprint)
+        if repeated is not None:
+            results[index] = _invalid(
+                f'Book repeats item {repeated} of this batch.'
+            )
+            continue
+        if target is not None:
+            claimed_ids[target] = index
+        claimed_fingerprints[book.fingerprint] = index
+        matched[index] = target
+
+    existing = BookModel.objects.select_for_update().in_bulk([
+        target for target in matched.values() if target is not None
+    ])
+
+    now = timezone.now()
+    created = []
+    updated = []
+    isbn_changed = []
+    for index, book, record in books:
+        if index not in matched:
+            continue
+        stored = existing.get(matched[index])
+        if stored is None:
+            created.append((index, book, record))
+            continue
+
+        if stored.isbn_list == book.isbn_list and all(
+            getattr(stored, field) == record[field] for field in BOOK_FIELDS
+        ):
+            results[index] = {'status': UNCHANGED, 'id': stored.pk}
+            continue
+
+        if stored.isbn_list != book.isbn_list:
+            isbn_changed.append((index, stored, record))
+        for field in BOOK_FIELDS:
+            setattr(stored, field, record[field])
+        stored.isbn_list = book.isbn_list
+        stored.set_fingerprint()
+        stored.set_pub_date_value()
+        stored.row_version += 1
+        stored.updated_at = now
+        updated.append(stored)
+        results[index] = {'status': UPDATED, 'id': stored.pk}
+
+    BookModel.objects.bulk_create(
+        [book for index, book, record in created],
+        batch_size=1000,
+    )
+    BookModel.objects.bulk_update(updated, UPDATE_FIELDS, batch_size=1000)
+    for index, book, record in created:
+        results[index] = {'status': CREATED, 'id': book.pk}
+
+    _delete_isbn_numbers([book.pk for index, book, record in isbn_changed])
+    IsbnModel.objects.bulk_create([
+        IsbnModel(book_id=book.pk, isbn_type=isbn_type, isbn_num=isbn_num)
+        for index, book, record in created + isbn_changed
+        for isbn_type, isbn_num in record['isbn']
+    ], batch_size=1000)
+
+    if created or updated:
+        catalog_changed(added=len(created))
+        record_changes(
+            [book.pk for index, book, record in created],
+            BookChange.CREATED,
+        )
+        record_changes([book.pk for book in updated], BookChange.UPDATED)
@@ -1,48 +1,108 @@
-import requests
-import json
+from urllib.parse import urlencode
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import condition
 from django.shortcuts import render, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
-from rest_framework.filters import SearchFilter, OrderingFilter
-
+from rest_framework.filters import OrderingFilter
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from book_list.catalog import (
+    book_count,
+    catalog_etag,
+    catalog_last_modified,
+)
+from book_list.changes import read_changes
+from book_list.export import CONTENT_TYPES, export_books
+from book_list.filters import BookFilter, BookSearchFilter
 from book_list.forms import (
     AddBookForm,
     ImportBooksForm,
     SearchForm, AddISBNForm, EditIsbnForm,
 )
 
-from book_list.models import BookModel, IsbnModel
-from book_list.serializers import BookSerializer
+from book_list.google_books import build_query
+from book_list.importer import run_import_job
+from book_list.lookup import lookup_books
+from book_list.models import BookModel, ImportJob, IsbnModel
+from book_list.pagination import BookPagination, CatalogPaginator, Keyset
+from book_list.search import search_book_ids
+from book_list.serializers import (
+    BookRowSerializer,
+    BookSerializer,
+    requested_fields,
+)
+from book_list.templatetags.book_cards import card_cache
+from book_list.upsert import (
+    CREATED,
+    INVALID,
+    UNCHANGED,
+    UPDATED,
+    upsert_books,
+)
+
+BOOK_LIST_KEYSET = Keyset('author', 'title', 'pub_date')
 
 
 class BookListView(View):
     """
     Class creates a view listing all books from db.
 
-    Get method returns a list of all books with pagination (set to 12 per page)
-    and form in context.
+    Get method returns a list of all books with keyset pagination (set to 12
+    per page, ?after= / ?before= cursors) and form in context. Total number
+    of books comes from catalog counter, exact count is run only if ?count=1
+    is given.
+
+    Get responses carry ETag and Last-Modified of the catalog, unchanged
+    pages are answered with 304 Not Modified without querying books.
 
-    Post method allows searching books in database based on keywords as well as
-    date range. If no books found returns form, error message and books
-    available, if books matching query found returns paginated
-    queryset with form.
+    Searching books by keywords and date range is done with GET parameters
+    (search, date_from, date_to), so results can be bookmarked and paged
+    through. Ids of matching books are cached (see search_book_ids), each
+    page loads only its books by primary key. If no books found returns
+    form and error message. Post method runs the same search for forms
+    submitted the old way.
     """
 
+    @method_decorator(condition(
+        etag_func=catalog_etag,
+        last_modified_func=catalog_last_modified,
+    ))
     def get(self, request):
+        if any(request.GET.get(name) for name in SearchForm.base_fields):
+            return self.search(request, request.GET)
+
         form = SearchForm()
-        book_list = BookModel.objects.all().order_by(
-            'author',
-            'title',
-            'pub_date',
-        )
-        paginator = Paginator(book_list, 12)
-        page_num = request.GET.get('page')
-        books = paginator.get_page(page_num)
+        book_list = BookModel.objects.all()
+        page_range = None
+
+        if request.GET.get('page'):
+            # page numbers of links created before keyset pagination
+            paginator = CatalogPaginator(
+                book_list.order_by('author', 'title', 'pub_date'),
+                12,
+            )
+            books = paginator.get_page(request.GET.get('page'))
+            page_range = paginator.page_window(books.number)
+            total = paginator.count
+        else:
+            if request.GET.get('count'):
+                total = book_list.count()
+            else:
+                total = book_count()
+            books = BOOK_LIST_KEYSET.page(
+                book_list,
+                12,
+                after=request.GET.get('after'),
+                before=request.GET.get('before'),
+            )
 
         return render(
             request,
@@ -50,41 +110,32 @@ class BookListView(View):
             context={
                 'books': books,
                 'form': form,
+                'total': total,
+                'page_range': page_range,
             }
         )
 
     def post(self, request):
-        form = SearchForm(request.POST)
+        return self.search(request, request.POST)
 
-        if form.is_valid():
-            search_q = form.cleaned_data['search']
-
-            book_list = BookModel.objects.all().filter(
-                Q(title__icontains=search_q) |
-                Q(author__icontains=search_q) |
-                Q(pub_lang__icontains=search_q)
-            ).order_by(
-                'author',
-                'title',
-                'pub_date',
-            )
-
-            if form.cleaned_data['date_from']:
-                book_list = book_list.filter(
-                    pub_date__gte=form.cleaned_data['date_from']
-                )
-
-            if form.cleaned_data['date_to']:
-                book_list = book_list.filter(
-                    pub_date__lte=form.cleaned_data['date_to']
-                )
+    def search(self, request, data):
+        form = SearchForm(data)
 
-            if book_list:
+        if form.is_valid():
+            book_ids = search_book_ids(**form.cleaned_data)
 
-                paginator = Paginator(book_list, 12)
+            if book_ids:
+                paginator = CatalogPaginator(book_ids, 12)
                 page_num = request.GET.get('page')
                 books = paginator.get_page(page_num)
-                form = SearchForm()
+                found = BookModel.objects.in_bulk(books.object_list)
+                books.object_list = [
+                    found[pk] for pk in books.object_list if pk in found
+                ]
+                query = urlencode({
+                    name: value
+                    for name, value in form.cleaned_data.items() if value
+                })
 
                 return render(
                     request,
@@ -92,6 +143,8 @@ class BookListView(View):
                     context={
                         'books': books,
                         'form': form,
+                        'page_range': paginator.page_window(books.number),
+                        'query': query,
                     }
                 )
             else:
@@ -137,20 +190,21 @@ class AddBookView(View):
         isbn_form = AddISBNForm(request.POST)
 
         if form.is_valid() and isbn_form.is_valid():
-            book = form.save()
-
-            if isbn_form.cleaned_data['isbn_num']:
-                isbn_type = ''
-                if len(isbn_form.cleaned_data['isbn_num']) == 10:
-                    isbn_type = 'ISBN_10'
-                elif len(isbn_form.cleaned_data['isbn_num']) == 13:
-                    isbn_type = 'ISBN_13'
-
-                IsbnModel.objects.create(
-                    book_id=book.pk,
-                    isbn_type=isbn_type,
-                    isbn_num=isbn_form.cleaned_data['isbn_num']
-                )
+            with transaction.atomic():
+                book = form.save()
+
+                if isbn_form.cleaned_data['isbn_num']:
+                    isbn_type = ''
+                    if len(isbn_form.cleaned_data['isbn_num']) == 10:
+                        isbn_type = 'ISBN_10'
+                    elif len(isbn_form.cleaned_data['isbn_num']) == 13:
+                        isbn_type = 'ISBN_13'
+
+                    IsbnModel.objects.create(
+                        book_id=book.pk,
+                        isbn_type=isbn_type,
+                        isbn_num=isbn_form.cleaned_data['isbn_num']
+                    )
 
             return redirect('/')
 
@@ -171,11 +225,11 @@ class ImportBooksView(View):
 
     Get method display import form.
 
-    Post method gets data from import form, builds import query and uses it
-    to retrieve data from Google Books API. After receiving data from
-    Google Books API tries to save the data in database and returns to book
-    list with information about number of imported books. If no books
-    matching query found, returns to form with appropriate message
+    Post method gets data from import form, builds import query and queues
+    import job for run_import_worker command. Returned page polls job status
+    until import is finished. If IMPORT_JOBS_RUN_INLINE setting is on, job
+    is run straight away and page shows number of imported books or
+    appropriate message if no books matching query found.
     """
 
     def get(self, request):
@@ -191,146 +245,41 @@ class ImportBooksView(View):
     def post(self, request):
         form = ImportBooksForm(request.POST)
         if form.is_valid():
-            max_result = 40
-            query = 'https://www.googleapis.com/books/v1/volumes?q='
-
-            search_title = form.cleaned_data['search_title']
-            search_author = form.cleaned_data['search_author']
-            search_isbn = form.cleaned_data['search_isbn']
-            search_publisher = form.cleaned_data['search_publisher']
-            search_subject = form.cleaned_data['search_subject']
-
             # build query with import criteria
-            if search_title:
-                query += f'+intitle:"{search_title}"'
-            if search_author:
-                query += f'+inauthor:"{search_author}"'
-            if search_isbn:
-                query += f'+isbn:{search_isbn}'
-            if search_publisher:
-                query += f'+inpublisher:"{search_publisher}"'
-            if search_subject:
-                query += f'+subject:"{search_subject}"'
-            query += f'&maxResults={max_result}&startIndex='  # max allowed results
-
-            # query start index
-            start_index = '0'
-            resp = requests.get(query + start_index)
-
-            # if any books found
-            if resp.status_code == 200 and json.loads(resp.text)['totalItems']:
-                books = json.loads(resp.text)['items']
-
-                # TODO: check why server times out if more than 40 books
-                # looked up!
-
-                # books_num = int(json.loads(resp.text)['totalItems'])
-                #
-                # # perform multiple queries if number of books found
-                # # is greater than max allowed per query (40) and add
-                # # query results to book list.
-                # while books_num >= 41:
-                #     start_index = str(int(start_index) + 40)
-                #     books_num -= 40
-                #     resp = requests.get(query + start_index)
-                #     books += json.loads(resp.text)['items']
-            else:
-                books = None
+            query = build_query(
+                title=form.cleaned_data['search_title'],
+                author=form.cleaned_data['search_author'],
+                isbn=form.cleaned_data['search_isbn'],
+                publisher=form.cleaned_data['search_publisher'],
+                subject=form.cleaned_data['search_subject'],
+            )
+            job = ImportJob.objects.create(
+                query=query,
+                all_pages=form.cleaned_data['all_pages'],
+            )
+
+            if not settings.IMPORT_JOBS_RUN_INLINE:
+                return render(
+                    request,
+                    'import_books.html',
+                    context={
+                        'conf_msg': 'Import queued',
+                        'form': ImportBooksForm(),
+                        'job': job,
+                    }
+                )
 
-            if books:
+            job = run_import_job(job)
+            if job.fetched:
                 # debug...
-                print(f'books found: {len(books)}')
-
-                books_added = 0
-                for b in books:
-                    try:
-                        title = b['volumeInfo']['title']
-                    except KeyError as e:
-                        print(e)
-                        title = None
-
-                    try:
-                        author = ', '.join(b['volumeInfo']['authors'])
-                    except KeyError as e:
-                        print(e)
-                        author = None
-
-                    try:
-                        pub_date = b['volumeInfo']['publishedDate']
-                    except KeyError as e:
-                        print(e)
-                        pub_date = None
-
-                    try:
-                        pub_lang = b['volumeInfo']['language']
-                    except KeyError as e:
-                        print(e)
-                        pub_lang = None
-
-                    try:
-                        page_count = int(b['volumeInfo']['pageCount'])
-                    except KeyError as e:
-                        print(e)
-                        page_count = None
-
-                    try:
-                        isbn = b['volumeInfo']['industryIdentifiers']
-                    except KeyError as e:
-                        print(e)
-                        isbn = None
-
-                    try:
-                        self_link = b['selfLink']
-                    except KeyError as e:
-                        print(e)
-                        self_link = None
-
-                    try:
-                        self_info = json.loads(requests.get(b['selfLink']).text)
-                        cover = self_info['volumeInfo']['imageLinks']['large']
-                    except KeyError as e:
-                        print(e)
-                        cover = None
-
-                    try:
-                        cover_link = b['volumeInfo']['imageLinks']['thumbnail']
-                    except KeyError as e:
-                        print(e)
-                        cover_link = None
-
-                    if title:
-                        if not BookModel.objects.filter(
-                                title=title,
-                                author=author,
-                                pub_lang=pub_lang,
-                                pub_date=pub_date,
-                        ).exists():
-                            book = BookModel.objects.create(
-                                title=title,
-                                author=author,
-                                pub_date=pub_date,
-                                pub_lang=pub_lang,
-                                pages=page_count,
-                                cover_link=cover_link,
-                                self_link=self_link,
-                                large_cover=cover,
-                            )
-                            books_added += 1
-                            if isbn:
-                                for num in isbn:
-                                    if 'isbn' in num['type'].lower():
-                                        IsbnModel.objects.create(
-                                            book_id=book.pk,
-                                            isbn_num=num['identifier'],
-                                            isbn_type=num['type'],
-                                        )
+                print(f'books found: {job.fetched}')
 
                 form = ImportBooksForm()
                 return render(
                     request,
                     'import_books.html',
                     context={
-                        "conf_msg": f'Books imported: {books_added}',
+                        "conf_msg": f'Books imported: {job.inserted}',
                         "form": form,
                     }
                 )
@@ -345,27 +294,209 @@ class ImportBooksView(View):
             )
 
 
+class ImportJobStatusView(View):
+    """
+    View returning progress of an import job as json.
+    Polled by import form page until the job is finished.
+    """
+
+    def get(self, request, pk):
+        try:
+            job = ImportJob.objects.get(pk=pk)
+        except ObjectDoesNotExist:
+            return JsonResponse({'error': 'Import job not found'}, status=404)
+        return JsonResponse(job.as_dict())
+
+
+class CardCacheStatsView(View):
+    """
+    View returning size and hit / miss counters of rendered book card
+    cache of the process serving the request.
+    """
+
+    def get(self, request):
+        return JsonResponse(card_cache.stats())
+
+
 class BooksAPIViewSet(generics.ListAPIView):
     """
     API end point allowing to view book list.
-    Pagination set to 10 entries per page.
+    Pagination set to 10 entries per page, see BookPagination.
+    Responses carry ETag and Last-Modified of the catalog, unchanged pages
+    are answered with 304 Not Modified.
+    Output can be narrowed with ?fields= or ?exclude= (comma separated
+    field names), only columns of returned fields are read from db.
+    Books are listed with BookRowSerializer, BookSerializer describes
+    the output.
     """
     queryset = BookModel.objects.order_by('title', 'author', 'pub_date')
     serializer_class = BookSerializer
+    pagination_class = BookPagination
     model = BookModel
     filter_backends = [
         DjangoFilterBackend,
-        SearchFilter,
         OrderingFilter,
+        BookSearchFilter,
     ]
 
     # Set up filtering options.
     # filterset_fields = ['title', 'author', 'pub_lang']
-    # use search instead of filtering.
+    # use search instead of filtering, filter only by publication date.
+    filterset_class = BookFilter
     search_fields = ['title', 'author', 'pub_lang']
     ordering_fields = ['title', 'author', 'pub_lang']
     ordering = ['title', 'author', 'pub_date']
 
+    def get_requested_fields(self):
+        """
+        :return: field names requested with ?fields= and ?exclude= or None
+        """
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = requested_fields(
+                self.request.query_params,
+            )
+        return self._requested_fields
+
+    def list(self, request, *args, **kwargs):
+        """
+        List books with BookRowSerializer - books are read with values(),
+        only columns of requested fields (and pagination keys) are loaded.
+        """
+        serializer = BookRowSerializer(self.get_requested_fields())
+        columns = {'id', *serializer.columns, *self.paginator.keyset.fields}
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page),
+            )
+        return Response(serializer.to_representation(queryset))
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    @method_decorator(condition(
+        etag_func=catalog_etag,
+        last_modified_func=catalog_last_modified,
+    ))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class BookExportView(View):
+    """
+    View streaming whole catalog as NDJSON (default) or CSV (?format=csv).
+    Books are read from db in chunks while the response is being sent.
+    """
+
+    def get(self, request):
+        file_format = request.GET.get('format', 'ndjson')
+        if file_format not in CONTENT_TYPES:
+            return JsonResponse({'error': 'Unknown format'}, status=400)
+
+        response = StreamingHttpResponse(
+            export_books(file_format),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="books.{file_format}"'
+        return response
+
+
+class BookChangesView(APIView):
+    """
+    API end point returning books changed after ?since= cursor (see
+    book_list.changes.read_changes). Deleted books come with null book.
+    Mirror keeps calling it with returned cursor until has_more is false.
+    """
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+        except ValueError:
+            return Response({'error': 'Invalid cursor'}, status=400)
+
+        entries, cursor, has_more = read_changes(since)
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'changes': [
+                {
+                    'id': book_id,
+                    'action': action,
+                    'book': BookSerializer(book).data if book else None,
+                }
+                for book_id, action, book in entries
+            ],
+        })
+
+
+class BookLookupView(APIView):
+    """
+    API end point finding many books at once.
+    POST body: {"ids": [...], "isbn": [...]} with up to BOOK_LOOKUP_MAX_KEYS
+    values in total. Every given value is answered with a book or null
+    (see book_list.lookup.lookup_books), ?fields= and ?exclude= work like
+    in BooksAPIViewSet.
+    """
+
+    def post(self, request):
+        ids = request.data.get('ids') or []
+        isbn = request.data.get('isbn') or []
+        if not isinstance(ids, list) or not isinstance(isbn, list):
+            return Response(
+                {'error': 'ids and isbn must be lists'},
+                status=400,
+            )
+        if len(ids) + len(isbn) > settings.BOOK_LOOKUP_MAX_KEYS:
+            return Response(
+                {
+                    'error': f'At most {settings.BOOK_LOOKUP_MAX_KEYS} ids '
+                             f'and ISBN numbers can be looked up at once',
+                },
+                status=400,
+            )
+
+        return Response(lookup_books(
+            ids,
+            isbn,
+            fields=requested_fields(request.query_params),
+        ))
+
+
+class BookBulkView(APIView):
+    """
+    API end point creating and updating books in bulk.
+    POST body: list of up to BOOK_BULK_MAX_ITEMS books (BookModel fields
+    with nested 'isbn' list of {"isbn_type", "isbn_num"}), written in
+    a single transaction (see book_list.upsert.upsert_books). Response
+    holds result of every item in order of the request.
+    """
+
+    def post(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'error': 'Expected list of books'}, status=400)
+        if len(items) > settings.BOOK_BULK_MAX_ITEMS:
+            return Response(
+                {
+                    'error': f'At most {settings.BOOK_BULK_MAX_ITEMS} books '
+                             f'can be sent at once',
+                },
+                status=400,
+            )
+
+        results = upsert_books(items)
+        return Response({
+            'counts': {
+                status: sum(result['status'] == status for result in results)
+                for status in (CREATED, UPDATED, UNCHANGED, INVALID)
+            },
+            'results': results,
+        })
+
 
 class EditBookView(View):
     """
@@ -424,35 +555,41 @@ class EditBookView(View):
         )
 
     def post(self, request, pk):
-        book_form = AddBookForm(request.POST)
+        try:
+            book = BookModel.objects.get(pk=pk)
+        except ObjectDoesNotExist as e:
+            print(e)
+            return redirect('/')
+
+        book_form = AddBookForm(request.POST, instance=book)
         isbn_form = EditIsbnForm(request.POST)
 
         if book_form.is_valid() and isbn_form.is_valid():
-            book = BookModel.objects.get(pk=pk)
-            book.title = book_form.cleaned_data['title']
-            book.author = book_form.cleaned_data['author']
-            book.pub_date = book_form.cleaned_data['pub_date']
-            book.pub_lang = book_form.cleaned_data['pub_lang']
-            book.pages = book_form.cleaned_data['pages']
-            book.cover_link = book_form.cleaned_data['cover_link']
-            book.self_link = book_form.cleaned_data['self_link']
-            book.large_cover = book_form.cleaned_data['large_cover']
-            book.save()
-
-            isbn_10 = isbn_form.cleaned_data['isbn_10']
-            isbn_13 = isbn_form.cleaned_data['isbn_13']
-
-            new_isbn_10 = IsbnModel.objects.update_or_create(
-                book_id=pk,
-                isbn_type='ISBN_10',
-                defaults={'isbn_num': isbn_10},
-            )
+            with transaction.atomic():
+                book.title = book_form.cleaned_data['title']
+                book.author = book_form.cleaned_data['author']
+                book.pub_date = book_form.cleaned_data['pub_date']
+                book.pub_lang = book_form.cleaned_data['pub_lang']
+                book.pages = book_form.cleaned_data['pages']
+                book.cover_link = book_form.cleaned_data['cover_link']
+                book.self_link = book_form.cleaned_data['self_link']
+                book.large_cover = book_form.cleaned_data['large_cover']
+                book.save()
+
+                isbn_10 = isbn_form.cleaned_data['isbn_10']
+                isbn_13 = isbn_form.cleaned_data['isbn_13']
+
+                new_isbn_10 = IsbnModel.objects.update_or_create(
+                    book_id=pk,
+                    isbn_type='ISBN_10',
+                    defaults={'isbn_num': isbn_10},
+                )
 
-            new_isbn_13 = IsbnModel.objects.update_or_create(
-                book_id=pk,
-                isbn_type='ISBN_13',
-                defaults={'isbn_num': isbn_13},
-            )
+                new_isbn_13 = IsbnModel.objects.update_or_create(
+                    book_id=pk,
+                    isbn_type='ISBN_13',
+                    defaults={'isbn_num': isbn_13},
+                )
 
             return redirect('/')
 
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'book_list',
     'rest_framework',
     'django_filters',
@@ -150,3 +151,95 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
 }
+
+# Google Books API
+# base url can point to local stand-in (manage.py fake_google_books)
+GOOGLE_BOOKS_API_URL = os.getenv(
+    'GOOGLE_BOOKS_API_URL',
+    'https://www.googleapis.com/books/v1',
+)
+# number of volume details looked up in parallel during import and
+# timeout (in seconds) of a single request.
+GOOGLE_BOOKS_MAX_WORKERS = int(os.getenv('GOOGLE_BOOKS_MAX_WORKERS', 8))
+GOOGLE_BOOKS_TIMEOUT = float(os.getenv('GOOGLE_BOOKS_TIMEOUT', 5))
+GOOGLE_BOOKS_MAX_PAGE_WORKERS = int(
+    os.getenv('GOOGLE_BOOKS_MAX_PAGE_WORKERS', 4)
+)
+# All Google Books requests share one rate limit (requests per second,
+# lowered automatically when Google answers 429), are retried with
+# exponential backoff (seconds) and stop for GOOGLE_BOOKS_BREAKER_RESET
+# seconds after GOOGLE_BOOKS_BREAKER_THRESHOLD failures in a row.
+GOOGLE_BOOKS_RATE = float(os.getenv('GOOGLE_BOOKS_RATE', 10))
+GOOGLE_BOOKS_BURST = int(os.getenv('GOOGLE_BOOKS_BURST', 20))
+GOOGLE_BOOKS_MAX_RETRIES = int(os.getenv('GOOGLE_BOOKS_MAX_RETRIES', 4))
+GOOGLE_BOOKS_BACKOFF_BASE = 0.5
+GOOGLE_BOOKS_BACKOFF_MAX = 30
+GOOGLE_BOOKS_BREAKER_THRESHOLD = 10
+GOOGLE_BOOKS_BREAKER_RESET = 30
+# seconds cached Google Books responses are served without revalidation
+GOOGLE_BOOKS_CACHE_TTL = int(os.getenv('GOOGLE_BOOKS_CACHE_TTL', 60 * 60))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Google Books responses, kept for revalidation long after their TTL
+    'google_books': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            'GOOGLE_BOOKS_CACHE_DIR',
+            os.path.join(BASE_DIR, '.cache', 'google_books'),
+        ),
+        'TIMEOUT': 60 * 60 * 24 * 7,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('GOOGLE_BOOKS_CACHE_ENTRIES', 20000)),
+        },
+    },
+}
+
+# Imports are queued and run by `manage.py run_import_worker`.
+# Set to True to run them inside the web request instead.
+IMPORT_JOBS_RUN_INLINE = os.getenv('IMPORT_JOBS_RUN_INLINE') == 'True'
+# Running jobs with no progress for this many seconds are taken over by
+# another worker, until they were tried IMPORT_JOBS_MAX_ATTEMPTS times.
+IMPORT_JOBS_STALE_AFTER = int(os.getenv('IMPORT_JOBS_STALE_AFTER', 15 * 60))
+IMPORT_JOBS_MAX_ATTEMPTS = 3
+
+# Write every page of imported books with bulk inserts in one
+# transaction. False saves books one by one (slower, kept for comparison).
+BOOK_IMPORT_BULK = os.getenv('BOOK_IMPORT_BULK', 'True') == 'True'
+
+# Book lists count books with PostgreSQL's planner estimate instead of
+# catalog counter once there are at least this many of them.
+BOOK_COUNT_ESTIMATE_ABOVE = int(
+    os.getenv('BOOK_COUNT_ESTIMATE_ABOVE', 1000000)
+)
+
+# Book list search keeps ordered ids of results of this many recent
+# searches (per process) for BOOK_SEARCH_CACHE_TTL seconds, up to
+# BOOK_SEARCH_MAX_RESULTS ids each.
+BOOK_SEARCH_CACHE_SIZE = int(os.getenv('BOOK_SEARCH_CACHE_SIZE', 256))
+BOOK_SEARCH_CACHE_TTL = int(os.getenv('BOOK_SEARCH_CACHE_TTL', 300))
+BOOK_SEARCH_MAX_RESULTS = int(os.getenv('BOOK_SEARCH_MAX_RESULTS', 1000))
+
+# Max number of rendered book cards kept in memory (per process).
+BOOK_CARD_CACHE_SIZE = int(os.getenv('BOOK_CARD_CACHE_SIZE', 5000))
+
+# Change feed (books/api/changes/) returns at most BOOK_CHANGES_PAGE_SIZE
+# changes per call, only those older than BOOK_CHANGES_DELAY seconds.
+BOOK_CHANGES_PAGE_SIZE = int(os.getenv('BOOK_CHANGES_PAGE_SIZE', 500))
+BOOK_CHANGES_DELAY = int(os.getenv('BOOK_CHANGES_DELAY', 5))
+
+# Number of books read from db at once by catalog export.
+BOOK_EXPORT_CHUNK_SIZE = int(os.getenv('BOOK_EXPORT_CHUNK_SIZE', 2000))
+
+# Max number of book ids and ISBN numbers looked up with one call to
+# books/api/lookup/.
+BOOK_LOOKUP_MAX_KEYS = int(os.getenv('BOOK_LOOKUP_MAX_KEYS', 500))
+
+# Max number of books created or updated with one call to books/api/bulk/.
+BOOK_BULK_MAX_ITEMS = int(os.getenv('BOOK_BULK_MAX_ITEMS', 5000))
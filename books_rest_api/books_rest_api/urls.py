@@ -19,7 +19,13 @@ from book_list.views import (
     BookListView,
     AddBookView,
     ImportBooksView,
+    ImportJobStatusView,
     BooksAPIViewSet,
+    BookBulkView,
+    BookChangesView,
+    BookExportView,
+    BookLookupView,
+    CardCacheStatsView,
     EditBookView,
 )
 
@@ -28,6 +34,36 @@ urlpatterns = [
     path('', BookListView.as_view(), name='book_list'),
     path('add_book/', AddBookView.as_view(), name='add_book'),
     path('import/', ImportBooksView.as_view(), name='import'),
+    path(
+        'import/jobs/<int:pk>/',
+        ImportJobStatusView.as_view(),
+        name='import_job',
+    ),
     path('books/api/', BooksAPIViewSet.as_view(), name='books_api'),
+    path(
+        'books/api/export/',
+        BookExportView.as_view(),
+        name='book_export',
+    ),
+    path(
+        'books/api/lookup/',
+        BookLookupView.as_view(),
+        name='book_lookup',
+    ),
+    path(
+        'books/api/bulk/',
+        BookBulkView.as_view(),
+        name='book_bulk',
+    ),
+    path(
+        'books/api/changes/',
+        BookChangesView.as_view(),
+        name='book_changes',
+    ),
+    path(
+        'books/cache-stats/',
+        CardCacheStatsView.as_view(),
+        name='card_cache_stats',
+    ),
     path('edit/<int:pk>/', EditBookView.as_view(), name='edit_book'),
 ]
@@ -1,8 +1,12 @@
 import pytest
+from django.core.cache import caches
+
 from book_list.models import (
     BookModel,
     IsbnModel,
 )
+from book_list.search import result_cache
+from book_list.templatetags.book_cards import card_cache
 
 
 @pytest.fixture
@@ -66,3 +70,34 @@ def isbn_number(example_books):
         book=example_books[2],
         isbn_type='ISBN_13',
     )
+
+
+@pytest.fixture(autouse=True)
+def google_books_settings(settings):
+    """
+    Keep cached Google Books responses in memory and don't hold back
+    requests to local stand-in server during tests
+    :param settings:
+    """
+    settings.CACHES = {
+        **settings.CACHES,
+        'google_books': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'google_books_tests',
+        },
+    }
+    settings.GOOGLE_BOOKS_RATE = 1000
+    settings.GOOGLE_BOOKS_BURST = 1000
+    settings.GOOGLE_BOOKS_BACKOFF_BASE = 0.01
+    yield
+    caches['google_books'].clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_process_caches():
+    """
+    Don't let cached search results and book cards outlive test database.
+    """
+    yield
+    result_cache.clear()
+    card_cache.clear()